@@ -1,6 +1,19 @@
 import uuid
+import ast
+import atexit
+import contextlib
+import io
+import math
 import os
+import hashlib
+import sqlite3
+import threading
+import functools
+import weakref
+from datetime import datetime
 import subprocess
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend: charts are only rendered to files, never shown
 import matplotlib.pyplot as plt
 import json
 import pandas as pd
@@ -26,8 +39,9 @@ from langchain.agents.agent_types import AgentType
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
 from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
 from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import HumanMessage, SystemMessage
 try:
-    from langchain.memory import ConversationBufferMemory
+    from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
     LANGCHAIN_MEMORY_AVAILABLE = True
 except Exception:
     LANGCHAIN_MEMORY_AVAILABLE = False
@@ -42,6 +56,9 @@ except ImportError:
 import seaborn as sns
 import numpy as np # Often needed with pandas and plotting
 from typing import Tuple, Optional, Dict
+from types import CodeType
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import textwrap
 
 # Import Plotly
@@ -53,6 +70,24 @@ except ImportError:
     PLOTLY_AVAILABLE = False
     print("Warning: Plotly is not installed. 3D interactive visualizations will not be available. Run 'pip install plotly'")
 
+# Optional: plotly-resampler bounds the points each trace carries, so scatter/line charts over
+# very large frames stay responsive in the browser and saved HTML stays small. It is registered
+# only while generated visualization code runs (see _plotly_resampling), never process-wide.
+PLOTLY_RESAMPLER_AVAILABLE = False
+if PLOTLY_AVAILABLE:
+    try:
+        from plotly_resampler import register_plotly_resampler, unregister_plotly_resampler
+        PLOTLY_RESAMPLER_AVAILABLE = True
+    except ImportError:
+        pass
+
+# orjson decodes large LLM JSON payloads several times faster than the stdlib parser
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging with UTF-8 encoding to handle emojis on Windows
 import sys
 logging.basicConfig(
@@ -74,6 +109,577 @@ if sys.platform.startswith('win'):
         # Python < 3.7 doesn't have reconfigure
         pass
 
+# Translation prompts are split into a byte-identical system prefix and a per-call human message,
+# so providers with automatic prompt caching can reuse the prefix across batches and requests
+TRANSLATE_SYSTEM_PROMPT = 'Translate each numbered value. Codes/IDs/numbers unchanged. Return ONLY JSON: {"1": "translation1", ...}'
+TRANSLATE_PROMPT = """Column '{column_name}', {n} values, to {target_language}:
+{batch_text}"""
+
+# Precompiled patterns for translation and deduplication LLM responses/requests
+_RE_JSON_FENCE_OPEN = re.compile(r'^```(?:json)?\s*', re.IGNORECASE | re.MULTILINE)
+_RE_FENCE_CLOSE = re.compile(r'```$', re.MULTILINE)
+_RE_TARGET_LANGUAGE = re.compile(r'to\s+([a-zA-Z]+)')
+_RE_COLUMN_REFERENCE = re.compile(r'(?:based on|using|with|for|in|from|of|by)\s+(?:column(?:s)?\s+)?([A-Za-z0-9_,\s]+)')
+
+# Vocabulary the clarification system learns user preferences from. The lookahead makes
+# the single scan report every (possibly overlapping) occurrence, like substring checks
+CLARIFICATION_ACTION_VERBS = ('find', 'show', 'create', 'make', 'generate', 'analyze', 'identify', 'clean', 'remove', 'fix')
+CLARIFICATION_SUBJECTS = ('junk', 'duplicate', 'chart', 'graph', 'data', 'trend', 'pattern', 'missing', 'null')
+# One bit per vocabulary word, so a query's hits fold into a single int mask
+_CLARIFICATION_WORD_BITS = {
+    word: 1 << bit for bit, word in enumerate(CLARIFICATION_ACTION_VERBS + CLARIFICATION_SUBJECTS)
+}
+# (word bit, pattern tag) in vocabulary order. Tags are dict keys on every preference
+# lookup; interned so equal tags are the same object
+_CLARIFICATION_TAG_BITS = tuple(
+    [(_CLARIFICATION_WORD_BITS[verb], sys.intern(f"action:{verb}")) for verb in CLARIFICATION_ACTION_VERBS]
+    + [(_CLARIFICATION_WORD_BITS[subject], sys.intern(f"subject:{subject}")) for subject in CLARIFICATION_SUBJECTS]
+)
+# Shortest vocabulary word; shorter queries cannot yield any pattern
+_CLARIFICATION_MIN_WORD_LENGTH = min(map(len, CLARIFICATION_ACTION_VERBS + CLARIFICATION_SUBJECTS))
+# Combined patterns: tag learned when every bit of the mask is set
+_CLARIFICATION_COMBINED_PATTERNS = (
+    (_CLARIFICATION_WORD_BITS['find'] | _CLARIFICATION_WORD_BITS['junk'], sys.intern("pattern:find_junk")),
+    (_CLARIFICATION_WORD_BITS['show'] | _CLARIFICATION_WORD_BITS['trend'], sys.intern("pattern:show_trend")),
+)
+_RE_CLARIFICATION_VOCABULARY = re.compile(
+    '(?=(' + '|'.join(map(re.escape, CLARIFICATION_ACTION_VERBS + CLARIFICATION_SUBJECTS)) + '))'
+)
+
+# Junk detection sends responses to the LLM in batches, several batches in flight at once
+JUNK_DETECTION_BATCH_SIZE = 50
+JUNK_DETECTION_MAX_CONCURRENCY = 4
+# Responses that are junk regardless of context: blank, one character repeated 4+ times, test/placeholder text
+_RE_OBVIOUS_JUNK = re.compile(r'^\s*$|^(.)\1{3,}$|^(?:test+(?:ing)?|asd+f+|n/?a|none|nothing|idk)$', re.IGNORECASE)
+
+# Shared Luckysheet cell-type payloads; read-only, referenced by every generated cell
+LUCKYSHEET_CT_GENERAL = {"fa": "General", "t": "g"}
+LUCKYSHEET_CT_NUMERIC = {"fa": "General", "t": "n"}
+
+# SQL cleanup for direct query execution: table references to rewrite and any existing LIMIT
+_SQL_REWRITE_RE = re.compile(r'(FROM|JOIN)\s+\w+|\blimit\b', re.IGNORECASE)
+
+# Generated pandas code: imports dropped because the execution scope already provides
+# them, and operations validate_code refuses to run
+DISALLOWED_IMPORT_PREFIXES = ('import pandas', 'import numpy', 'import os')
+UNSAFE_CODE_CALLS = frozenset({'eval', 'exec', 'open', '__import__', 'compile'})
+UNSAFE_CODE_MODULES = frozenset({'subprocess'})  # Rejected on any attribute call
+ALLOWED_OS_ATTRIBUTES = frozenset({'path', 'makedirs'})  # The only os.<attr> / "from os import" names allowed
+# Top-level packages generated code may import; everything else is rejected before and during exec
+ALLOWED_IMPORT_MODULES = frozenset({
+    'pandas', 'numpy', 'matplotlib', 'seaborn', 'plotly', 'os',
+    'math', 'statistics', 'datetime', 're', 'uuid', 'collections', 'itertools', 'json',
+})
+
+# Direct SQL results are consumed in batches and capped before being rendered as markdown
+SQL_RESULT_FETCH_SIZE = 1000
+SQL_RESULT_MAX_ROWS = 10000
+# Appended to generated SELECTs that have no LIMIT of their own; one row past the render cap so
+# the fetch loop can still tell that the result was truncated
+SQL_DEFAULT_LIMIT = SQL_RESULT_MAX_ROWS + 1
+SQL_SUMMARY_ROW_CAP = 200  # Larger results are summarized from a preview plus column statistics
+
+# Result-formatting prompts, filled with str.format so the constant rules are built once
+SQL_FORMAT_DIRECT_RESULT_PROMPT = """User asked: "{question}"
+SQL query executed: {sql_query}
+Raw result from database: {result}
+
+TASK: Convert the raw SQL result into a clear, readable answer.
+
+RULES:
+- ONLY state facts that appear in the raw result above. Do NOT invent, assume, or fabricate any data.
+- If the result is a count, state the count. If it's a list, present the list clearly.
+- Use natural language to present the numbers/data from the result.
+- Round numbers to whole numbers where appropriate.
+- Keep the response concise (2-4 sentences for simple results, a short list for multiple rows).
+- Do NOT add "insights", "recommendations", or "what this means for your business".
+- Do NOT reference data that isn't in the raw result.
+- If the result is empty or zero, say so clearly."""
+SQL_FORMAT_RESPONSE_PROMPT = """The user asked: "{question}"
+
+The data result is: "{raw_response}"
+
+TASK: Rewrite the data result as a clear, readable answer.
+
+RULES:
+- ONLY state facts present in the data result above. Do NOT invent or fabricate any information.
+- Give a direct answer in 1-2 sentences first.
+- If there are multiple data points, list them under "Key Details:" using bullet points.
+- Round numbers to whole numbers where appropriate.
+- Do NOT add sections like "Why This Matters", "Insights", or "Recommendations".
+- Do NOT invent statistics, trends, or context not in the result.
+- If the result is empty, say no matching data was found.
+- Keep it concise and factual.
+
+Optionally, suggest 1-2 follow-up questions the user could ask about their data under "Explore Further:"."""
+
+_MD_ESCAPE = str.maketrans({"|": "\\|", "\n": " ", "\r": " "})  # Keeps text cells inside one markdown table cell
+
+# Duplicate-request intent, each list folded into one alternation so a question is scanned once
+_RE_DUPLICATE_CHECK_INTENT = re.compile(
+    r'are there any duplicates|does.*have duplicates|how many duplicates|count.*duplicates|find.*duplicates'
+    r'|any duplicate|list.*duplicates|which.*duplicates|show.*duplicates|get.*duplicates'
+)
+_RE_DUPLICATE_REMOVE_INTENT = re.compile(
+    r'remove duplicate|drop duplicate|deduplicate|delete duplicate|eliminate duplicate'
+)
+_RE_DUPLICATE_CHECK_ONLY = re.compile(
+    r'are there any duplicates|does.*have duplicates|how many duplicates|count.*duplicates|find.*duplicates'
+    r'|any duplicate|check.*duplicate'
+)
+
+# Questions asking for duplicate removal ("can you ... remove ... duplicates"), one alternation
+_RE_DUPLICATE_REMOVAL_QUESTION = re.compile(
+    r'(?:can you|could you|would you|please|how (?:can|do) (?:I|we|you)|is it possible to)'
+    r'.+(?:remove|get rid of|delete|drop|eliminate).+duplicate'
+)
+
+# Values made only of digits, dots and dashes (numbers, IDs, dates) are not worth translating
+NUMERIC_LIKE_PATTERN = r'[.\-]*\d[\d.\-]*'
+
+# Bulk translation sends the distinct values of all selected columns together and asks for JSON back
+BULK_TRANSLATION_BATCH_SIZE = 100
+BULK_TRANSLATION_MAX_CONCURRENCY = 4
+BULK_TRANSLATE_PROMPT = """{n} values to {target_language}:
+{batch_text}"""
+BULK_TRANSLATION_ANALYSIS_SYSTEM_PROMPT = """
+You analyze bulk translation requests for a dataset.
+
+Extract the following information:
+1. Which columns should be translated? Options:
+   - "all" for all columns
+   - ["col1", "col2"] for specific columns
+   - "range:A-E" for a range of columns (A through E)
+   - "first:5" for first N columns
+   - "last:3" for last N columns
+2. What is the target language? (default: English)
+3. Should we skip columns that appear to contain only numbers/IDs?
+
+Return your analysis in this exact JSON format:
+{
+    "columns_to_translate": "all" or ["column1", "column2"] or "range:A-E" or "first:5" or "last:3",
+    "target_language": "English",
+    "skip_numeric_columns": true
+}
+"""
+
+# Plain "translate <all|first N|last N|columns A-E> to <language>" requests are parsed without an LLM call
+_RE_SIMPLE_BULK_TRANSLATION = re.compile(
+    r'^\s*(?:please\s+)?(?:bulk\s+|batch\s+|mass\s+)?translate\s+'
+    r'(?:(?P<all>all(?:\s+(?:the\s+)?(?:columns|data))?|everything|(?:the\s+)?(?:entire|whole)\s+(?:dataset|sheet|table))'
+    r'|(?:the\s+)?first\s+(?P<first>\d+)\s+columns?'
+    r'|(?:the\s+)?last\s+(?P<last>\d+)\s+columns?'
+    r'|columns?\s+(?P<start>[a-z])\s*(?:-|to|through)\s*(?P<end>[a-z]))'
+    r'\s+(?:to|into)\s+(?P<language>[a-z]+)\s*[.!]?\s*$',
+    re.IGNORECASE
+)
+KNOWN_TRANSLATION_LANGUAGES = frozenset({
+    'english', 'spanish', 'french', 'german', 'italian', 'portuguese', 'dutch', 'russian', 'polish',
+    'turkish', 'arabic', 'hebrew', 'persian', 'urdu', 'hindi', 'bengali', 'chinese', 'japanese',
+    'korean', 'vietnamese', 'thai', 'indonesian', 'malay', 'swedish', 'norwegian', 'danish',
+    'finnish', 'greek', 'czech', 'romanian', 'hungarian', 'ukrainian'
+})
+
+
+def _parse_simple_bulk_translation(question: str) -> Optional[Dict]:
+    """
+    Deterministically parse simple bulk translation requests.
+    Returns an analysis dict in the same shape the LLM analysis produces, or None when the
+    request needs the LLM to interpret it.
+    """
+    match = _RE_SIMPLE_BULK_TRANSLATION.match(question)
+    if not match or match.group('language').lower() not in KNOWN_TRANSLATION_LANGUAGES:
+        return None
+    
+    if match.group('all'):
+        columns_spec = 'all'
+    elif match.group('first'):
+        columns_spec = f"first:{match.group('first')}"
+    elif match.group('last'):
+        columns_spec = f"last:{match.group('last')}"
+    else:
+        columns_spec = f"range:{match.group('start').upper()}-{match.group('end').upper()}"
+    
+    return {
+        'columns_to_translate': columns_spec,
+        'target_language': match.group('language').title(),
+        'skip_numeric_columns': True,
+    }
+
+
+def _strip_code_fence(text: str, language: str) -> str:
+    """
+    Remove a markdown code fence (```language ... ```) wrapping an LLM response.
+    LLM replies only carry fences at the very start and end, so literal prefix/suffix
+    checks are enough and no regex scan is needed.
+    """
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped[3:]
+        if stripped[:len(language)].lower() == language:
+            stripped = stripped[len(language):]
+    if stripped.endswith("```"):
+        stripped = stripped[:-3]
+    return stripped.strip()
+
+
+def _extract_fenced_code(text: str, fence: str):
+    """
+    Body of the first fence ... fence block in text (an optional "python" tag after the
+    opening fence is skipped), or None when there is no complete block. Two str.find
+    calls locate the block without a regex scan.
+    """
+    start = text.find(fence)
+    if start == -1:
+        return None
+    start += len(fence)
+    if text.startswith("python", start):
+        start += len("python")
+    end = text.find(fence, start)
+    if end == -1:
+        return None
+    return text[start:end].strip()
+
+
+def _find_unsafe_operation(tree: ast.AST) -> Optional[str]:
+    """
+    First unsafe construct in a parsed snippet: a denied builtin call, an import outside
+    ALLOWED_IMPORT_MODULES, any use of os (or an alias of it) outside ALLOWED_OS_ATTRIBUTES,
+    a subprocess call, or dunder access.
+    """
+    os_names = {'os'}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.partition('.')[0] not in ALLOWED_IMPORT_MODULES:
+                    return f"import {alias.name}"
+                if alias.name == 'os' and alias.asname:
+                    os_names.add(alias.asname)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ''
+            if node.level or module.partition('.')[0] not in ALLOWED_IMPORT_MODULES:
+                return f"from {'.' * node.level}{module} import"
+            if module == 'os':
+                for alias in node.names:
+                    if alias.name not in ALLOWED_OS_ATTRIBUTES:
+                        return f"from os import {alias.name}"
+            elif module.startswith('os.') and module.split('.')[1] not in ALLOWED_OS_ATTRIBUTES:
+                return f"from {module} import"
+
+    allowed_os_refs = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in UNSAFE_CODE_CALLS:
+                return f"{func.id}()"
+            if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                    and func.value.id in UNSAFE_CODE_MODULES):
+                return f"{func.value.id}.{func.attr}()"
+        elif isinstance(node, ast.Attribute):
+            if node.attr.startswith('__') and node.attr.endswith('__'):
+                return f"access to {node.attr}"
+            if isinstance(node.value, ast.Name) and node.value.id in os_names:
+                if node.attr not in ALLOWED_OS_ATTRIBUTES:
+                    return f"os.{node.attr}"
+                allowed_os_refs.add(id(node.value))
+        elif isinstance(node, ast.Name):
+            if node.id == '__builtins__':
+                return "access to __builtins__"
+            # A bare os reference (o = os; getattr-style use) would slip past the attribute check
+            if node.id in os_names and id(node) not in allowed_os_refs and not isinstance(node.ctx, ast.Store):
+                return "bare reference to os"
+    return None
+
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """__import__ for the generated-code sandbox: only ALLOWED_IMPORT_MODULES resolve"""
+    if level or name.partition('.')[0] not in ALLOWED_IMPORT_MODULES:
+        raise ImportError(f"Importing '{name}' is not allowed in generated code")
+    return __import__(name, globals, locals, fromlist, level)
+
+
+_plotly_resampler_lock = threading.Lock()
+_plotly_resampler_users = 0
+
+
+@contextlib.contextmanager
+def _plotly_resampling():
+    """
+    Register plotly-resampler for the duration of a generated visualization run. Registration
+    patches go.Figure globally, so overlapping runs are reference-counted and the last one out
+    unregisters it; figures built elsewhere in the backend are unaffected between runs.
+    """
+    global _plotly_resampler_users
+    if not PLOTLY_RESAMPLER_AVAILABLE:
+        yield
+        return
+    with _plotly_resampler_lock:
+        if _plotly_resampler_users == 0:
+            register_plotly_resampler(mode='auto')
+        _plotly_resampler_users += 1
+    try:
+        yield
+    finally:
+        with _plotly_resampler_lock:
+            _plotly_resampler_users -= 1
+            if _plotly_resampler_users == 0:
+                unregister_plotly_resampler()
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_generated_code(code: str) -> Tuple[Optional[str], Optional[CodeType]]:
+    """
+    Parse generated code once, check the tree and compile that same tree. Returns
+    (unsafe operation, None) or (None, code object); recurring snippets (repeated chart
+    requests) skip the parse entirely. Raises SyntaxError for unparsable code.
+    """
+    tree = ast.parse(code, '<string>', 'exec')
+    unsafe_operation = _find_unsafe_operation(tree)
+    if unsafe_operation:
+        return unsafe_operation, None
+    return None, compile(tree, '<string>', 'exec')
+
+
+def _sanitize_generated_sql(sql_query: str) -> str:
+    """
+    Clean LLM-generated SQL in one scan: strip the code fence, force every table
+    reference to 'data' and append SQL_DEFAULT_LIMIT to SELECTs that have no LIMIT.
+    """
+    sql_query = _strip_code_fence(sql_query, "sql")
+    has_limit = False
+
+    def rewrite(match):
+        nonlocal has_limit
+        if match.group(1) is None:
+            has_limit = True
+            return match.group(0)
+        return f"{match.group(1).upper()} data"
+
+    sql_query = _SQL_REWRITE_RE.sub(rewrite, sql_query)
+    # Bound the work of read queries that came back without a LIMIT
+    if not has_limit and sql_query[:6].upper() == "SELECT":
+        sql_query = f"{sql_query.rstrip(';').rstrip()} LIMIT {SQL_DEFAULT_LIMIT}"
+    return sql_query
+
+
+@functools.lru_cache(maxsize=64)
+def _markdown_table_separator(column_count: int) -> str:
+    """Markdown separator row for a table with the given number of columns"""
+    return f"|{' --- |' * column_count}"
+
+
+def _format_markdown_rows(frame: pd.DataFrame) -> str:
+    """
+    Render a batch of SQL result rows as markdown table rows, one column at a time.
+    NULLs become "NULL", floats are rounded to whole numbers and pipes in text are escaped.
+    """
+    line = None
+    for position in range(frame.shape[1]):
+        column = frame.iloc[:, position]
+        nulls = column.isna()
+        if pd.api.types.is_float_dtype(column):
+            # Round float values to whole numbers; the int64 cast is only exact below 2**63, so
+            # larger sums and +/-inf fall back to Python ints and plain str like the row-wise path
+            rounded = column.round()
+            if ((rounded.abs() < 2.0 ** 63) | nulls).all():
+                formatted = rounded.fillna(0).astype(np.int64).astype(str)
+            else:
+                formatted = rounded.map(lambda v: str(int(v)) if math.isfinite(v) else str(v))
+        elif pd.api.types.is_integer_dtype(column) or pd.api.types.is_bool_dtype(column):
+            formatted = column.astype(str)
+        else:
+            # Escape pipes and flatten line breaks in one translate pass
+            formatted = column.astype(str).str.translate(_MD_ESCAPE)
+        formatted = formatted.where(~nulls, "NULL")
+        line = formatted if line is None else line + " | " + formatted
+    if line is None:
+        return ""
+    return ("| " + line + " |").str.cat(sep="\n")
+
+
+def _parse_scalar_sql_result(result: str):
+    """
+    Return the single numeric value of a db.run() result such as "[(42,)]", or None.
+    LangChain's SQLDatabase.run returns the repr of a list of row tuples.
+    """
+    text = result.strip()
+    if not (text.startswith("[(") and text.endswith(",)]")):
+        return None
+    try:
+        rows = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+    if len(rows) != 1 or len(rows[0]) != 1:
+        return None
+    value = rows[0][0]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    # nan/inf are left to the LLM path rather than stated as an answer
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _column_data_category(dtype) -> str:
+    """
+    Extraction dialog category for a column dtype. Covers nullable, Arrow-backed and
+    timezone-aware dtypes as well as the NumPy ones.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "Date/Time"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "Other"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "Numeric"
+    if pd.api.types.is_string_dtype(dtype) or dtype == object:
+        return "Text"
+    return "Other"
+
+
+def _select_text_columns(df: pd.DataFrame, columns) -> list:
+    """
+    The columns worth translating. Only object, string and category columns are sampled;
+    every other dtype (numeric, bool, datetime, timedelta) is non-text, since its str()
+    form would not look numeric and be sent for translation. A sampled column is text
+    when under half of its first 10 non-null values look numeric (NUMERIC_LIKE_PATTERN).
+    """
+    candidate_columns = [
+        col for col, dtype in df[columns].dtypes.items()
+        if pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype)
+    ]
+    # Share of numeric-looking values per candidate column, one vectorized regex pass each
+    numeric_frac = pd.Series({
+        col: df[col].dropna().head(10).astype(str).str.fullmatch(NUMERIC_LIKE_PATTERN).mean()
+        for col in candidate_columns
+    }, dtype=float)
+    # Columns with no data yield NaN and are dropped
+    is_text = (numeric_frac < 0.5).reindex(columns, fill_value=False)
+    return [col for col in columns if is_text[col]]
+
+
+def _sheet_display_matrix(df: pd.DataFrame):
+    """
+    Display strings ("" for missing values) and the missing-value mask of a DataFrame.
+    Both are returned in row-major (C) order because sheets are emitted row by row,
+    while pandas blocks are usually column-major.
+    """
+    na_mask = np.ascontiguousarray(df.isna().to_numpy())
+    display_values = np.ascontiguousarray(np.where(na_mask, "", df.astype(str).to_numpy(dtype=object)))
+    return display_values, na_mask
+
+
+@functools.lru_cache(maxsize=2048)
+def _extract_clarification_patterns(query_lower: str) -> Tuple[str, ...]:
+    """
+    Preference-learning patterns (action:, subject: and combined pattern: tags) for a
+    lowercased query. The vocabulary is static, so results are memoized per query.
+    """
+    # One scan folds every vocabulary word occurring anywhere in the query into a bitmask
+    mask = 0
+    for match in _RE_CLARIFICATION_VOCABULARY.finditer(query_lower):
+        mask |= _CLARIFICATION_WORD_BITS[match.group(1)]
+    if not mask:
+        return ()
+    
+    # Action verbs then subject nouns, in vocabulary order
+    patterns = [tag for bit, tag in _CLARIFICATION_TAG_BITS if mask & bit]
+    
+    # Combined patterns, from the same mask with no further passes over the query
+    patterns.extend(tag for bits, tag in _CLARIFICATION_COMBINED_PATTERNS if mask & bits == bits)
+    
+    return tuple(patterns)
+
+
+def _first_unique_values(series: pd.Series, k: int = 3, probe_rows: int = 1000):
+    """
+    First k distinct non-null values of a column, in order of appearance.
+    The leading rows almost always contain k distinct values, so the full column is
+    only scanned when they do not.
+    """
+    head_values = series.iloc[:probe_rows].dropna().unique()
+    if len(head_values) >= k or len(series) <= probe_rows:
+        return head_values[:k]
+    return series.dropna().unique()[:k]
+
+
+def _loads_json(content):
+    """Parse JSON text returned by the LLM, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _row_hashes(df: pd.DataFrame, subset_columns=None) -> pd.Series:
+    """
+    One uint64 hash per row (over subset_columns if given) so duplicate detection compares
+    8 bytes per row instead of every cell of every column.
+    """
+    return pd.util.hash_pandas_object(df[subset_columns] if subset_columns else df, index=False)
+
+
+def _duplicated_mask(df: pd.DataFrame, subset_columns=None, keep='first', candidates=None) -> np.ndarray:
+    """
+    Exact df.duplicated() result as a boolean array. Row hashes only narrow the check to rows
+    whose hash repeats (or to the given candidates mask); df.duplicated() then confirms those
+    rows, since hashing stringifies mixed object columns and 1 and "1" would otherwise collide.
+    """
+    if candidates is None:
+        candidates = _row_hashes(df, subset_columns).duplicated(keep=False).to_numpy()
+    mask = np.zeros(len(df), dtype=bool)
+    if candidates.any():
+        mask[candidates] = df[candidates].duplicated(subset=subset_columns or None, keep=keep).to_numpy()
+    return mask
+
+
+def _collect_streamed_json_object(text_chunks) -> str:
+    """
+    Consume streamed LLM text until the first top-level JSON object closes and return it,
+    so parsing can start without waiting for the rest of the stream. Braces inside JSON
+    strings are ignored; if no object closes, everything received is returned.
+    """
+    buffer = io.StringIO()
+    depth = 0
+    in_string = escaped = False
+    for text in text_chunks:
+        for offset, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"' and depth:
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}' and depth:
+                depth -= 1
+                if depth == 0:
+                    buffer.write(text[:offset + 1])
+                    return buffer.getvalue()
+        buffer.write(text)
+    return buffer.getvalue()
+
+
+def _apply_translations(cat_col: pd.Series, translations: dict) -> np.ndarray:
+    """
+    Translate a categorical column by translating its categories once and gathering by code.
+    Untranslated categories keep their original value and missing cells (code -1) stay missing.
+    """
+    categories = cat_col.cat.categories.to_numpy(dtype=object)
+    translated_categories = np.empty(len(categories), dtype=object)
+    translated_categories[:] = [translations.get(category, category) for category in categories]
+    codes = cat_col.cat.codes.to_numpy()
+    return np.where(codes >= 0, translated_categories.take(codes), cat_col.to_numpy(dtype=object))
+
+
+def _build_numbered_batch_text(batch) -> str:
+    """Render a batch of values as a numbered list ("1. value") for translation prompts"""
+    buffer = io.StringIO()
+    buffer.writelines(f"{j}. {value}\n" for j, value in enumerate(batch, 1))
+    return buffer.getvalue().rstrip("\n")
+
 # CustomSQLDatabaseToolkit definition
 class CustomSQLDatabaseToolkit(SQLDatabaseToolkit):
     def __init__(self, db, llm):
@@ -87,7 +693,198 @@ class CustomSQLDatabaseToolkit(SQLDatabaseToolkit):
             QuerySQLDataBaseTool(db=self.db, llm=self.llm),
         ]
 
+class TranslationCache:
+    """
+    Persistent translation cache backed by SQLite.
+    Entries are keyed by (blake2b digest of the source text, target language) so repeated
+    runs and other sessions can reuse translations without another LLM call.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = os.path.abspath(db_path or os.path.join(settings.CACHE_DIR, "translations.db"))
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "text_hash TEXT NOT NULL, target_language TEXT NOT NULL, translation TEXT NOT NULL, "
+            "PRIMARY KEY (text_hash, target_language))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _hash_text(text) -> str:
+        return hashlib.blake2b(str(text).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_many(self, values, target_language: str) -> dict:
+        """Return {value: translation} for every value already cached for target_language"""
+        language = target_language.lower()
+        hashed = {self._hash_text(value): value for value in values}
+        if not hashed:
+            return {}
+        hits = {}
+        keys = list(hashed)
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, translation FROM translations "
+                    f"WHERE target_language = ? AND text_hash IN ({placeholders})",
+                    [language, *chunk],
+                ).fetchall()
+                for text_hash, translation in rows:
+                    hits[hashed[text_hash]] = translation
+        return hits
+
+    def set_many(self, translations: dict, target_language: str):
+        """Store {value: translation} pairs for target_language"""
+        if not translations:
+            return
+        language = target_language.lower()
+        rows = [(self._hash_text(value), language, translation) for value, translation in translations.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (text_hash, target_language, translation) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+class AgentMemoryBuffer:
+    """
+    Compact working memory for data queries: the last question, SQL statement, schema
+    lookups and result preview. Rendered as a small JSON blob for the next prompt instead
+    of replaying the raw transcript with every intermediate agent step.
+    """
+    SLOTS = ("last_query", "last_sql", "last_schema_hits", "last_result_preview")
+    PREVIEW_MAX_CHARS = 500  # Result previews are clipped so the rendered context stays small
+
+    def __init__(self):
+        self._slots = dict.fromkeys(self.SLOTS)
+
+    def write(self, slot_name: str, value):
+        """Replace one slot's value"""
+        if slot_name not in self._slots:
+            raise KeyError(f"Unknown memory slot: {slot_name}")
+        if slot_name == "last_result_preview" and isinstance(value, str) and len(value) > self.PREVIEW_MAX_CHARS:
+            value = value[:self.PREVIEW_MAX_CHARS] + "..."
+        self._slots[slot_name] = value
+
+    def record_agent_steps(self, intermediate_steps):
+        """Keep only the last SQL statement, its result and any schema lookups from an agent run"""
+        schema_hits = []
+        last_sql = last_result = None
+        for action, observation in intermediate_steps:
+            tool = getattr(action, "tool", "")
+            if tool == "sql_db_query":
+                last_sql, last_result = action.tool_input, observation
+            elif tool == "sql_db_schema":
+                schema_hits.append(action.tool_input)
+        if last_sql is not None:
+            self.write("last_sql", last_sql)
+            self.write("last_result_preview", str(last_result))
+        if schema_hits:
+            self.write("last_schema_hits", schema_hits)
+
+    def clear(self):
+        self._slots = dict.fromkeys(self.SLOTS)
+
+    def render(self) -> str:
+        """Filled slots as compact JSON, or "" when nothing has been recorded yet"""
+        filled = {name: value for name, value in self._slots.items() if value}
+        if not filled:
+            return ""
+        return json.dumps(filled, ensure_ascii=False, separators=(",", ":"), default=str)
+
+class ClarificationPreferenceStore:
+    """
+    Persistent clarification preference counts backed by SQLite.
+    Rows are (scope, pattern, category, count), so each user or workspace learns its own
+    preferences; increments are buffered in memory and written back in batches so each
+    learned choice does not cost a commit. Use shared_preference_store() rather than
+    constructing one per clarification system.
+    """
+    FLUSH_INTERVAL = 20  # Buffered increments written back per commit
+
+    def __init__(self, db_path=None):
+        self.db_path = os.path.abspath(db_path or os.path.join(settings.CACHE_DIR, "clarification_preferences.db"))
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = Counter()  # Map: (scope, pattern, category) -> increments not yet written
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scoped_preferences ("
+            "scope TEXT NOT NULL, pattern TEXT NOT NULL, category TEXT NOT NULL, count INTEGER NOT NULL, "
+            "PRIMARY KEY (scope, pattern, category))"
+        )
+        self._conn.commit()
+
+    def load(self, scope: str) -> list:
+        """Return every stored (pattern, category, count) row of a scope in first-learned order"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT pattern, category, count FROM scoped_preferences WHERE scope = ? ORDER BY rowid", (scope,)
+            ).fetchall()
+
+    def increment(self, scope: str, keys):
+        """Buffer one increment per (pattern, category) key of a scope, writing back once enough accumulate"""
+        with self._lock:
+            self._pending.update((scope, pattern, category) for pattern, category in keys)
+            if sum(self._pending.values()) >= self.FLUSH_INTERVAL:
+                self._flush_locked()
+
+    def flush(self):
+        """Write every buffered increment back to the database"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Flush buffered increments and close the connection"""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT INTO scoped_preferences (scope, pattern, category, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (scope, pattern, category) DO UPDATE SET count = count + excluded.count",
+            [(scope, pattern, category, count) for (scope, pattern, category), count in self._pending.items()],
+        )
+        self._conn.commit()
+        self._pending.clear()
+
+
+_preference_stores = {}  # Map: absolute db path -> the process-wide ClarificationPreferenceStore
+_preference_stores_lock = threading.Lock()
+
+
+def shared_preference_store(db_path=None) -> ClarificationPreferenceStore:
+    """
+    The single ClarificationPreferenceStore for a database path. Clarification systems share it,
+    so there is one connection per file and one atexit flush, however many systems are created.
+    """
+    key = os.path.abspath(db_path or os.path.join(settings.CACHE_DIR, "clarification_preferences.db"))
+    with _preference_stores_lock:
+        store = _preference_stores.get(key)
+        if store is None:
+            store = _preference_stores[key] = ClarificationPreferenceStore(key)
+            # Buffered increments would otherwise be lost on a clean shutdown
+            atexit.register(store.close)
+        return store
+
 class AgentServices:
+    # Bounds for the per-instance query category LRU cache
+    CATEGORY_CACHE_MAX_SIZE = 4096
+    # Bound for the per-instance cache of LLM result-formatting replies
+    FORMAT_CACHE_MAX_SIZE = 256
+    # Cleared matplotlib figures kept open for reuse by the next chart
+    FIGURE_POOL_SIZE = 2
+    # PNG resolution for saved charts; in-app previews are downsampled by the browser anyway
+    CHART_PREVIEW_DPI = 100
+
     def __init__(self, llm, speech_util_instance, charts_dir=None):
         self.llm = llm
         self.speech_util = speech_util_instance
@@ -110,15 +907,11 @@ class AgentServices:
             else:
                 logger.debug(f"Directory already exists: {self.charts_dir}")
             
-            # Test write permissions
-            try:
-                test_file = os.path.join(self.charts_dir, "test.txt")
-                with open(test_file, 'w') as f:
-                    f.write("test")
-                os.remove(test_file)
+            # Test write permissions with a single access() check instead of a probe file
+            if os.access(self.charts_dir, os.W_OK | os.X_OK):
                 logger.info(f"Confirmed write permissions for: {self.charts_dir}")
-            except Exception as e:
-                logger.error(f"Cannot write to {self.charts_dir}: {str(e)}")
+            else:
+                logger.error(f"Cannot write to {self.charts_dir}: permission denied")
                 # Fall back to static directory if path is not writable
                 self.charts_dir = os.path.abspath("static")
                 logger.info(f"Falling back to: {self.charts_dir}")
@@ -141,13 +934,10 @@ class AgentServices:
             os.makedirs(self.charts_dir, exist_ok=True)
 
         self.agent_executor = None
-        # Maintain low-level chat histories and wrap them with a ConversationBufferMemory
+        # Maintain low-level chat histories and wrap them with a summarizing conversation memory
         self.chat_history = InMemoryChatMessageHistory()
-        if LANGCHAIN_MEMORY_AVAILABLE:
-            self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True, chat_memory=self.chat_history)
-        else:
-            # Fallback: keep history only (no true memory features)
-            self.memory = None
+        self.memory = self._build_conversation_memory()
+        self.memory_buffer = AgentMemoryBuffer()  # Last query/SQL/result slots for follow-up questions
         self.chat_histories = {}  # Map: chat_id -> InMemoryChatMessageHistory
         self.current_chat_id = None  # Track current active chat
         self.inferred_context = None
@@ -155,6 +945,24 @@ class AgentServices:
         self.analysis_results = []
         self.visualizations = []
         self.data_handler = None
+        self._category_cache = OrderedDict()  # Map: normalized question -> (category, confidence)
+        self._format_cache = OrderedDict()  # Map: prompt digest -> formatted LLM reply
+        self._llm_pool = ThreadPoolExecutor(max_workers=4)  # Background LLM calls that overlap local work
+        self._figure_pool = []  # Cleared pyplot figures reused across charts
+        self._column_mapping_source = None  # Column mapping the cached JSON below was built from
+        self._column_mapping_json = None
+        self._df_preview_cache = None  # (weakref to frame, head() text, dtypes text) for code prompts
+        self._sql_executor = None  # (kind, callable) resolved once per SQL database object
+        self._sql_executor_db = None
+        self._sql_connection = None  # Reused SQLAlchemy connection for the "connect" executor
+        self._sql_connection_lock = threading.Lock()
+        
+        # Persistent translation cache shared across sessions
+        try:
+            self.translation_cache = TranslationCache()
+        except Exception as e:
+            logger.warning(f"⚠️ Translation cache unavailable, translations will not be reused: {str(e)}")
+            self.translation_cache = None
         
         # Initialize Supabase client for persistent memory
         self.supabase_client = None
@@ -180,6 +988,8 @@ class AgentServices:
     def initialize_agents(self, data_handler_instance):
         self.data_handler = data_handler_instance
         db_sqlalchemy = self.data_handler.get_db_sqlalchemy_object()
+        self._sql_executor = None  # Toolkit and database are rebuilt below
+        self._close_sql_connection()
         
         # Initialize the data cleaning agent
         self.data_cleaning_agent = DataCleaningAgent(self.llm)
@@ -235,10 +1045,64 @@ Remember: You're a helpful assistant who happens to excel at data analysis, not
             self.agent_executor = None
         if self.memory:
             self.memory.clear()
+        self.memory_buffer.clear()
+        # Data (re)loaded: serialize the new column mapping once for the prompts that embed it
+        self._column_mapping_source = self._column_mapping_json = None
+        self._df_preview_cache = None
+        if self.data_handler is not None:
+            self._get_column_mapping_json()
+
+    def _get_column_mapping_json(self) -> str:
+        """
+        Column mapping as indented JSON for prompts. Serialized only when the data handler
+        hands out a different mapping object (it builds a new dict on every data change).
+        """
+        column_mapping = self.data_handler.get_column_mapping()
+        if self._column_mapping_json is None or column_mapping is not self._column_mapping_source:
+            if ORJSON_AVAILABLE:
+                serialized = orjson.dumps(column_mapping, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+            else:
+                serialized = json.dumps(column_mapping, indent=2)
+            self._column_mapping_source = column_mapping
+            self._column_mapping_json = serialized
+        return self._column_mapping_json
+
+    def _get_df_preview_text(self, df):
+        """
+        (head() text, dtypes text) for code-generation prompts. Rebuilt only when the data
+        handler holds a different frame; cell text is clipped to keep the prompt short.
+        """
+        cached = self._df_preview_cache
+        if cached is None or cached[0]() is not df:
+            head_text = df.head().to_string(max_colwidth=40)
+            cached = (weakref.ref(df), head_text, df.dtypes.to_string())
+            self._df_preview_cache = cached
+        return cached[1], cached[2]
+
+    def _build_conversation_memory(self):
+        """
+        Wrap the current chat history in agent memory. Turns beyond settings.MEMORY_MAX_TOKENS
+        are folded into a running summary, so each agent prompt carries a bounded history.
+        """
+        if not LANGCHAIN_MEMORY_AVAILABLE:
+            # Fallback: keep history only (no true memory features)
+            return None
+        if self.llm:
+            return ConversationSummaryBufferMemory(
+                llm=self.llm,
+                max_token_limit=settings.MEMORY_MAX_TOKENS,
+                memory_key="chat_history",
+                return_messages=True,
+                chat_memory=self.chat_history,
+            )
+        # Summarizing needs an LLM; without one keep the plain buffer
+        return ConversationBufferMemory(memory_key="chat_history", return_messages=True, chat_memory=self.chat_history)
 
     def reset_state(self):
         if self.memory:
             self.memory.clear()
+        self.memory_buffer.clear()
+        self._df_preview_cache = None
         self.inferred_context = None
         self.data_summary = None
         self.analysis_results = []
@@ -297,13 +1161,15 @@ Remember: You're a helpful assistant who happens to excel at data analysis, not
             
             self.chat_histories[chat_id] = self.chat_history
         
-        # Update current chat reference
+        # Update current chat reference; slots from the previous chat must not leak into this one
+        if chat_id != self.current_chat_id:
+            self.memory_buffer.clear()
         self.current_chat_id = chat_id
         
         # Update agent executor with new memory if initialized
         if self.agent_executor and hasattr(self.agent_executor, 'memory') and LANGCHAIN_MEMORY_AVAILABLE:
-            # Re-wrap current chat_history in ConversationBufferMemory
-            self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True, chat_memory=self.chat_history)
+            # Re-wrap current chat_history in conversation memory
+            self.memory = self._build_conversation_memory()
             self.agent_executor.memory = self.memory
             logger.debug(f"🔧 Updated agent executor memory for chat: {chat_id}")
     
@@ -319,8 +1185,9 @@ Remember: You're a helpful assistant who happens to excel at data analysis, not
         if self.current_chat_id == chat_id:
             self.chat_history = InMemoryChatMessageHistory()
             self.current_chat_id = None
+            self.memory_buffer.clear()
             if self.agent_executor and hasattr(self.agent_executor, 'memory') and LANGCHAIN_MEMORY_AVAILABLE:
-                self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True, chat_memory=self.chat_history)
+                self.memory = self._build_conversation_memory()
                 self.agent_executor.memory = self.memory
 
     def switch_kb_context(self, kb_id: str, chat_id: str):
@@ -643,13 +1510,14 @@ Remember: You're a helpful assistant who happens to excel at data analysis, not
             logger.info("Operation cancelled flag detected in generate_pandas_code")
             return None, "I've stopped processing that request as you requested."
         
-        if self.data_handler.get_df() is None:
+        df = self.data_handler.get_df(copy=False)  # Read-only: prompt text only
+        if df is None:
             logger.error("No DataFrame available in data_handler")
             return None, "I need some data to work with first. Please upload a dataset."
 
         try:
-            column_mapping = self.data_handler.get_column_mapping()
-            df = self.data_handler.get_df()
+            column_mapping_json = self._get_column_mapping_json()
+            df_head_text, df_dtypes_text = self._get_df_preview_text(df)
             logger.debug(f"DataFrame shape: {df.shape}, columns: {df.columns.tolist()}")
             
             plotly_instruction = ""
@@ -659,7 +1527,7 @@ Remember: You're a helpful assistant who happens to excel at data analysis, not
         - For 3D visualizations or complex interactive plots, PREFER `plotly.express as px`.
           - Generate the Plotly figure object (e.g., `fig = px.scatter_3d(...)`).
           - Create a unique HTML filename: `chart_filename = f"generated_charts/plot_{uuid.uuid4()}.html"`
-          - Save the figure: `fig.write_html(chart_filename)`
+          - Save the figure, loading plotly.js from the CDN: `fig.write_html(chart_filename, include_plotlyjs="cdn")`
           - Assign the `chart_filename` string to `result`.
         - For simpler 2D plots, you can use `matplotlib.pyplot as plt`.
           - Create the plot and assign the figure to `result` (e.g., `result = plt.gcf()`).
@@ -679,11 +1547,11 @@ You are an expert Python programmer specializing in pandas, matplotlib, and plot
 
 Query: "{question}"
 Query Category: {query_category}
-Column Mapping: {json.dumps(column_mapping, indent=2)}
+Column Mapping: {column_mapping_json}
 DataFrame Info (first 5 rows):
-{df.head().to_string()}
+{df_head_text}
 DataFrame dtypes:
-{df.dtypes.to_string()}
+{df_dtypes_text}
 
 Instructions:
 1. Your code will be executed in a function, so DO NOT use 'return' statements.
@@ -695,7 +1563,7 @@ Instructions:
 6. Ensure the code handles errors, edge cases, and invalid inputs gracefully within a try-except block. Assign any error message string to 'result' in case of failure.
 7. DO NOT attempt file I/O operations other than saving plots as instructed (e.g., `fig.write_html()` for Plotly, or matplotlib saving handled externally).
 8. Keep code simple and focused on the specific task.
-9. If using matplotlib, create a new figure with `plt.figure()` before plotting.
+9. If using matplotlib, draw on the current figure (`fig = plt.gcf()`); it is already created and sized, so do NOT call `plt.figure()`.
 
 Code template:
 '''python
@@ -713,11 +1581,11 @@ try:
     #     fig = px.scatter_3d(df, x='col1', y='col2', z='col3')
     #     chart_filename = f"generated_charts/plot_{{uuid.uuid4()}}.html"
     #     # The directory 'generated_charts' will be created if it doesn't exist by the calling code.
-    #     fig.write_html(chart_filename)
+    #     fig.write_html(chart_filename, include_plotlyjs="cdn")
     #     result = chart_filename
     # else: # Example for Matplotlib
     #     import matplotlib.pyplot as plt # plt is available
-    #     plt.figure()
+    #     fig = plt.gcf() # Current figure, already prepared
     #     df['some_column'].plot(kind='hist')
     #     result = plt.gcf() # Get current figure
 
@@ -736,34 +1604,17 @@ except Exception as e:
                 if self.operation_cancelled_flag: 
                     return None, "I've stopped processing that request as you requested."
 
-                code_match = re.search(r"```(?:python)?\s*(.*?)```", response, re.DOTALL) or \
-                            re.search(r"'''(?:python)?\s*(.*?)'''", response, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1).strip()
-                    code_lines = code.split('\n')
-                    filtered_lines = []
-                    for line in code_lines:
-                        if line.strip().startswith(('import pandas', 'import numpy', 'import os')):
-                            continue
-                        filtered_lines.append(line)
-                    code = '\n'.join(filtered_lines)
+                code = _extract_fenced_code(response, "```")
+                if code is None:
+                    code = _extract_fenced_code(response, "'''")
+                if code is not None:
+                    code = '\n'.join(
+                        line for line in code.split('\n')
+                        if not line.lstrip().startswith(DISALLOWED_IMPORT_PREFIXES)
+                    )
                     logger.debug(f"Generated code length: {len(code) if code else 0}")
                     return code, None
-                else:
-                    lines = response.split('\n')
-                    potential_code = []
-                    in_code_block = False
-                    for line in lines:
-                        if "result =" in line or "df." in line or "plt." in line or (PLOTLY_AVAILABLE and "px." in line):
-                            in_code_block = True
-                        if in_code_block:
-                            potential_code.append(line)
-                    if potential_code:
-                        reconstructed_code = "result = None\ntry:\n    " + "\n    ".join(potential_code) + \
-                                            "\nexcept Exception as e:\n    print(f\"Error: {str(e)}\")\n    result = f\"Error: {str(e)}\""
-                        logger.debug(f"Generated code length: {len(reconstructed_code) if reconstructed_code else 0}")
-                        return reconstructed_code, None
-                    return None, "Could not extract valid Python code from the response."
+                return None, "Could not extract valid Python code from the response."
             except Exception as e:
                 logger.exception("Error in generate_pandas_code LLM invocation")
                 return None, f"Error generating pandas code: {str(e)}"
@@ -771,36 +1622,32 @@ except Exception as e:
             logger.exception("Error in generate_pandas_code setup")
             return None, f"Error in code generation setup: {str(e)}"
 
-    def validate_code(self, code):
-        """Validate code for common mistakes before execution."""
+    def validate_code(self, code) -> Tuple[bool, str, Optional[CodeType]]:
+        """
+        Validate code for common mistakes before execution.
+        Returns (is_valid, message, compiled code object or None when invalid).
+        """
         if not code:
-            return False, "No code to validate."
-
-        dangerous_patterns = [
-            r'open\(',
-            r'subprocess\.',
-            r'eval\(',
-            r'exec\(',
-            r'__import__\('
-        ]
-
-        for pattern in dangerous_patterns:
-            if re.search(pattern, code):
-                if 'fig.write_html' in code and pattern == r'open\(': # Allow fig.write_html
-                    continue
-                return False, f"Code contains potentially unsafe operations: {pattern}"
+            return False, "No code to validate.", None
 
         try:
-            compile(code, '<string>', 'exec')
-            return True, "Code validation passed."
-        except SyntaxError as e:
-            return False, f"Code contains syntax errors: {str(e)}"
+            unsafe_operation, compiled_code = _compile_generated_code(code)
+        except (SyntaxError, ValueError) as e:
+            return False, f"Code contains syntax errors: {str(e)}", None
+
+        if unsafe_operation:
+            return False, f"Code contains potentially unsafe operations: {unsafe_operation}", None
+        return True, "Code validation passed.", compiled_code
 
     def safe_execute_pandas_code(self, code, query_category):
         """Safely execute generated pandas code in a restricted environment."""
         if query_category == 'VISUALIZATION':
-            # Ensure we're using a fresh figure
-            plt.close('all')
+            # Ensure we're using a fresh figure: close strays, then make a clean pooled one current
+            pooled_numbers = {fig.number for fig in self._figure_pool}
+            for number in plt.get_fignums():
+                if number not in pooled_numbers:
+                    plt.close(number)
+            self._acquire_figure()
         
         if self.operation_cancelled_flag:
             logger.info("Operation cancelled flag detected in safe_execute_pandas_code")
@@ -811,14 +1658,15 @@ except Exception as e:
             return None, "No code to execute."
 
         try:
-            is_valid, validation_message = self.validate_code(code)
+            is_valid, validation_message, compiled_code = self.validate_code(code)
             logger.debug(f"Code validation result - Valid: {is_valid}, Message: {validation_message}")
             
             if not is_valid:
                 logger.error(f"Code validation failed: {validation_message}")
                 return None, f"Code validation failed: {validation_message}"
 
-            df_copy_for_execution = self.data_handler.get_df().copy()
+            # get_df() already returns a private copy; generated code may mutate it freely
+            df_copy_for_execution = self.data_handler.get_df()
             logger.debug(f"Created DataFrame copy for execution, shape: {df_copy_for_execution.shape}")
 
             # Set up execution environment
@@ -837,7 +1685,7 @@ except Exception as e:
                     'tuple': tuple, 'zip': zip, 'round': round, 'sum': sum, 'min': min,
                     'max': max, 'abs': abs, 'all': all, 'any': any, 'enumerate': enumerate,
                     'filter': filter, 'map': map, 'sorted': sorted, 'Exception': Exception,
-                    'TypeError': TypeError, 'ValueError': ValueError, '__import__': __import__
+                    'TypeError': TypeError, 'ValueError': ValueError, '__import__': _restricted_import
                 }
             }
             
@@ -854,7 +1702,11 @@ except Exception as e:
             
             # Execute the code
             logger.debug("Executing code in restricted environment")
-            exec(code, safe_globals, safe_locals)
+            if query_category == 'VISUALIZATION':
+                with _plotly_resampling():
+                    exec(compiled_code, safe_globals, safe_locals)
+            else:
+                exec(compiled_code, safe_globals, safe_locals)
             
             if self.operation_cancelled_flag:
                 logger.info("Operation cancelled during code execution")
@@ -871,7 +1723,7 @@ except Exception as e:
                     viz_paths, message = self._save_matplotlib_figure(execution_result)
                     logger.debug(f"Save matplotlib result: paths={viz_paths}, message={message}")
                     return viz_paths, message
-                elif plt.get_fignums():  # Check for any open figures
+                elif plt.get_fignums() and plt.gcf().axes:  # Check for an open figure with something drawn
                     logger.debug("Found open matplotlib figures")
                     viz_paths, message = self._save_matplotlib_figure(plt.gcf())
                     logger.debug(f"Save matplotlib result: paths={viz_paths}, message={message}")
@@ -893,18 +1745,48 @@ except Exception as e:
             logger.exception("Error in safe_execute_pandas_code")
             return None, f"Error executing generated code: {str(e)}"
 
+    def _acquire_figure(self):
+        """Make a clean figure current for generated code, reusing a pooled one when available"""
+        if self._figure_pool:
+            fig = self._figure_pool.pop()
+            plt.figure(fig.number)
+        else:
+            fig = plt.figure(figsize=(12, 8))
+        return fig
+
+    def _release_figure(self, fig):
+        """Clear a saved figure back into the pool, or close it once the pool is full"""
+        if len(self._figure_pool) < self.FIGURE_POOL_SIZE and fig not in self._figure_pool and plt.fignum_exists(fig.number):
+            fig.clf()
+            # Undo the per-chart margin tweaks so the next chart starts from the defaults
+            fig.subplotpars.update(**{
+                name: matplotlib.rcParams[f'figure.subplot.{name}']
+                for name in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')
+            })
+            self._figure_pool.append(fig)
+        else:
+            plt.close(fig)
+
     def _save_matplotlib_figure(self, fig):
-        """Helper method to save Matplotlib figures."""
+        """
+        Helper method to save Matplotlib figures at CHART_PREVIEW_DPI.
+        Runs synchronously on the request thread: the response needs the file on disk, and the
+        figure lives in pyplot's shared registry, so there is no work to overlap with the encode.
+        """
+        dpi = self.CHART_PREVIEW_DPI
         logger.debug("Entering _save_matplotlib_figure")
         try:
             logger.debug("Configuring Matplotlib figure size")
             fig.set_size_inches(12, 8)  # Larger figure size
+            # Object-oriented calls on this figure only, independent of pyplot's current figure
             logger.debug("Setting Matplotlib xticks rotation")
-            plt.xticks(rotation=45, ha='right')
+            for ax in fig.axes:
+                for label in ax.get_xticklabels():
+                    label.set(rotation=45, ha='right')
             logger.debug("Adjusting Matplotlib subplots")
-            plt.subplots_adjust(bottom=0.2)
+            fig.subplots_adjust(bottom=0.2)
             logger.debug("Applying Matplotlib tight_layout")
-            plt.tight_layout(pad=2.0)
+            fig.tight_layout(pad=2.0)
             
             logger.debug("Generating unique filename for Matplotlib figure")
             # Simple filename with no subdirectories
@@ -915,17 +1797,20 @@ except Exception as e:
             
             logger.info(f"Attempting to save Matplotlib figure to: {filepath}")
             
-            # Save the figure with higher DPI 
+            # Encode into memory, then write the file in one call
             try:
                 logger.debug(f"Calling fig.savefig() for: {filepath}")
-                fig.savefig(filepath, 
+                png_buffer = io.BytesIO()
+                fig.savefig(png_buffer, 
                            bbox_inches='tight', 
-                           dpi=300,  # Increased DPI for better quality
+                           dpi=dpi,
                            format='png'  # Explicitly set format
                 )
+                with open(filepath, 'wb') as png_file:
+                    png_file.write(png_buffer.getbuffer())
                 logger.info(f"Successfully saved Matplotlib figure to: {filepath} using fig.savefig()")
-                plt.close(fig)
-                logger.debug(f"Closed figure after saving: {filepath}")
+                self._release_figure(fig)
+                logger.debug(f"Released figure after saving: {filepath}")
                 
                 # Return a dictionary with visualization paths and filename as required by frontend
                 visualization_paths = {
@@ -943,12 +1828,12 @@ except Exception as e:
                     plt.figure(fig.number) # Set current figure
                     plt.savefig(filepath, 
                               bbox_inches='tight', 
-                              dpi=300,  # Increased DPI for better quality
+                              dpi=dpi,
                               format='png'  # Explicitly set format
                     )
                     logger.info(f"Successfully saved Matplotlib figure to: {filepath} using plt.savefig()")
-                    plt.close(fig)
-                    logger.debug(f"Closed figure after fallback save: {filepath}")
+                    self._release_figure(fig)
+                    logger.debug(f"Released figure after fallback save: {filepath}")
                     
                     # Return a dictionary with visualization paths and filename as required by frontend
                     visualization_paths = {
@@ -1041,6 +1926,14 @@ except Exception as e:
         logger.info(f"🔍 === CATEGORIZING QUERY ===")
         logger.info(f"📝 Input: '{question}'")
         
+        # Repeated questions are answered from the LRU cache without another LLM round-trip
+        question_norm = question.strip().lower()
+        cached = self._category_cache.get(question_norm)
+        if cached is not None:
+            self._category_cache.move_to_end(question_norm)
+            logger.info(f"⚡ Category cache hit: {cached[0]} ({cached[1]}% confidence)")
+            return cached
+        
         # Get basic categorization first
         logger.info(f"🎯 Running basic categorization...")
         initial_category = self._categorize_query_basic(question)
@@ -1049,7 +1942,12 @@ except Exception as e:
         # Return basic categorization directly (clarification system removed)
         default_confidence = 70
         logger.info(f"📊 Returning basic categorization: {initial_category} with default {default_confidence}% confidence")
-        return initial_category, default_confidence
+        result = (initial_category, default_confidence)
+        
+        self._category_cache[question_norm] = result
+        if len(self._category_cache) > self.CATEGORY_CACHE_MAX_SIZE:
+            self._category_cache.popitem(last=False)
+        return result
     
     def _categorize_query_basic(self, question: str) -> str:
         """Categorize the query to determine the appropriate processing method"""
@@ -2086,10 +2984,9 @@ No other format is acceptable."""
                     if self.data_handler is not None:
                         db_obj = self.data_handler.get_db_sqlalchemy_object()
                         logger.debug(f"🔍 get_db_sqlalchemy_object() is None: {db_obj is None}")
-                        df = self.data_handler.get_df()
-                        logger.debug(f"🔍 get_df() is None: {df is None}")
-                        if df is not None:
-                            logger.debug(f"🔍 DataFrame shape: {df.shape}")
+                        logger.debug(f"🔍 get_df() is None: {current_df is None}")
+                        if current_df is not None:
+                            logger.debug(f"🔍 DataFrame shape: {current_df.shape}")
                     
                     if self.data_handler is None or self.data_handler.get_db_sqlalchemy_object() is None:
                         logger.error("❌ Database not available - data_handler or db_sqlalchemy_object is None")
@@ -2100,18 +2997,26 @@ No other format is acceptable."""
                         logger.debug("🔧 Using SIMPLE mode - direct SQL execution...")
                         response = self._execute_sql_query_directly(question)
                         logger.debug(f"✅ Simple mode execution completed: {response}")
+                        self.memory_buffer.write("last_query", question)
+                        self.memory_buffer.write("last_result_preview", response)
                         # Apply enhanced template formatting to Simple mode as well
                         return self._format_sql_response(response, question)
                     else:  # complex mode
                         logger.debug("🔧 Using COMPLEX mode - agent executor...")
                         try:
+                            memory_context = self.memory_buffer.render()
                             enhanced_question = f"""
                             Answer this question about the data: "{question}"
                             
                             IMPORTANT: When querying the data, include relevant context columns and provide comprehensive analysis.
                             """
-                            agent_response = self.agent_executor.invoke({"input": enhanced_question})["output"]
+                            if memory_context:
+                                enhanced_question += f"\nPrevious query context (JSON, use only if the question follows up on it): {memory_context}\n"
+                            agent_result = self.agent_executor.invoke({"input": enhanced_question})
+                            agent_response = agent_result["output"]
                             logger.debug(f"✅ Complex mode execution completed: {agent_response}")
+                            self.memory_buffer.write("last_query", question)
+                            self.memory_buffer.record_agent_steps(agent_result.get("intermediate_steps", ()))
                             return self._format_sql_response(agent_response, question)
                         except Exception as agent_error:
                             logger.error(f"❌ Complex mode failed: {str(agent_error)}")
@@ -2299,25 +3204,15 @@ Keep responses conversational, human-like, SHORT, and context-aware."""
                 'unique rows', 'remove duplicates', 'drop duplicates'
             ]
             
-            # Enhanced patterns for questions about duplicate removal
-            question_patterns = [
-                r'can you.+(?:remove|get rid of|delete|drop|eliminate).+duplicate',
-                r'could you.+(?:remove|get rid of|delete|drop|eliminate).+duplicate',
-                r'would you.+(?:remove|get rid of|delete|drop|eliminate).+duplicate',
-                r'please.+(?:remove|get rid of|delete|drop|eliminate).+duplicate',
-                r'how (?:can|do) (?:I|we|you).+(?:remove|get rid of|delete|drop|eliminate).+duplicate',
-                r'is it possible to.+(?:remove|get rid of|delete|drop|eliminate).+duplicate'
-            ]
-            
             # Check for direct keyword matches
             is_duplicate_removal = any(pattern in question_lower for pattern in duplicate_patterns)
             
-            # If no direct match, check for question patterns
+            # If no direct match, check the precompiled question patterns
             if not is_duplicate_removal:
-                is_duplicate_removal = any(re.search(pattern, question_lower) for pattern in question_patterns)
-            if is_duplicate_removal:
-                    matched_patterns = [p for p in question_patterns if re.search(p, question_lower)]
-                    logger.info(f"🔍 Matched question patterns: {matched_patterns}")
+                question_match = _RE_DUPLICATE_REMOVAL_QUESTION.search(question_lower)
+                is_duplicate_removal = question_match is not None
+                if is_duplicate_removal:
+                    logger.info(f"🔍 Matched question pattern: '{question_match.group(0)}'")
             
             if is_duplicate_removal:
                 logger.info("🧹 === DIRECT DUPLICATE REMOVAL DETECTION ===")
@@ -2393,16 +3288,7 @@ Keep responses conversational, human-like, SHORT, and context-aware."""
                 df = self.data_handler.get_df()
                 if df is not None:
                     # Determine if this is checking or removal
-                    check_patterns = [
-                        r'are there any duplicates',
-                        r'does.*have duplicates',
-                        r'how many duplicates',
-                        r'count.*duplicates',
-                        r'find.*duplicates',
-                        r'any duplicate',
-                        r'check.*duplicate'
-                    ]
-                    is_check_only = any(re.search(p, question.lower()) for p in check_patterns)
+                    is_check_only = bool(_RE_DUPLICATE_CHECK_ONLY.search(question_lower))
                     
                     if is_check_only:
                         # Simple duplicate checking
@@ -2491,10 +3377,10 @@ Keep responses conversational, human-like, SHORT, and context-aware."""
         if self.operation_cancelled_flag:
             return "I've stopped processing that request as you requested.", None
             
-        if not self.data_handler or self.data_handler.get_df() is None:
+        df = self.data_handler.get_df() if self.data_handler else None
+        if df is None:
             return "I need some data to create visualizations. Please upload a dataset first.", None
             
-        df = self.data_handler.get_df()
         logger.debug(f"📊 DataFrame shape: {df.shape}")
         
         try:
@@ -2695,8 +3581,8 @@ Keep the analysis concise but thorough, focusing on business value and practical
             
             # Get basic data info if available
             data_info = ""
-            if self.data_handler and self.data_handler.get_df() is not None:
-                df = self.data_handler.get_df()
+            df = self.data_handler.get_df() if self.data_handler else None
+            if df is not None:
                 data_info = f"Dataset contains {len(df)} rows and {len(df.columns)} columns."
             
             fallback = {
@@ -2779,7 +3665,7 @@ Keep the analysis concise but thorough, focusing on business value and practical
             
             # Step 3: Extract target language if specified (default to English)
             target_language = "English"  # Default
-            language_match = re.search(r'to\s+([a-zA-Z]+)', question.lower())
+            language_match = _RE_TARGET_LANGUAGE.search(question.lower())
             if language_match:
                 target_language = language_match.group(1).title()
                 logger.debug(f"🌍 Target language detected: {target_language}")
@@ -2801,57 +3687,42 @@ Keep the analysis concise but thorough, focusing on business value and practical
             if len(unique_values) == 0:
                 return f"Column '{column_name}' has no data to translate."
             
-            # Step 6: Translate in batches if there are many unique values
-            translations = {}
+            # Step 6: Reuse cached translations, then translate the misses in batches
+            translations = self.translation_cache.get_many(unique_values, target_language) if self.translation_cache else {}
+            pending_values = [value for value in unique_values if value not in translations]
+            logger.debug(f"💾 Translation cache: {len(translations)} hits, {len(pending_values)} misses")
             batch_size = 25  # Adjust based on token limits
             
-            for i in range(0, len(unique_values), batch_size):
-                batch = unique_values[i:i+batch_size]
-                logger.debug(f"🔄 Processing batch {i//batch_size + 1}/{(len(unique_values)-1)//batch_size + 1} with {len(batch)} items")
+            for i in range(0, len(pending_values), batch_size):
+                batch = pending_values[i:i+batch_size]
+                logger.debug(f"🔄 Processing batch {i//batch_size + 1}/{(len(pending_values)-1)//batch_size + 1} with {len(batch)} items")
                 
                 # Create a numbered list for clear value identification
-                batch_text = "\n".join([f"{j+1}. {value}" for j, value in enumerate(batch)])
-                
-                translation_prompt = f"""
-                Translate the following {len(batch)} values from column '{column_name}' to {target_language}.
-                Maintain the same structure and format, just translate the text.
-                If a value appears to be a code, ID, or number, keep it unchanged.
-                
-                Values to translate:
-                {batch_text}
-                
-                Return ONLY the translations as a numbered list matching the original numbering, like this:
-                1. [translation1]
-                2. [translation2]
-                ...and so on.
-                """
+                translation_prompt = TRANSLATE_PROMPT.format(
+                    n=len(batch),
+                    column_name=column_name,
+                    target_language=target_language,
+                    batch_text=_build_numbered_batch_text(batch),
+                )
                 
                 try:
-                    translation_response = self.llm.invoke(translation_prompt).content.strip()
-                    
-                    # Parse the response to get translations
-                    translation_lines = translation_response.split('\n')
-                    for j, line in enumerate(translation_lines):
-                        if j >= len(batch):
-                            break
-                            
-                        # Extract just the translated value, removing numbering
-                        match = re.match(r'^\d+\.\s*(.*?)$', line.strip())
-                        if match:
-                            translated_value = match.group(1).strip()
-                            original_value = batch[j]
-                            translations[original_value] = translated_value
-                            logger.debug(f"✅ Translated: '{original_value}' → '{translated_value}'")
+                    batch_result = self._invoke_translation_json(TRANSLATE_SYSTEM_PROMPT, translation_prompt)
+                    batch_translations = {
+                        original_value: str(batch_result[str(j)]).strip()
+                        for j, original_value in enumerate(batch, 1)
+                        if str(j) in batch_result
+                    }
+                    logger.debug(f"✅ Translated {len(batch_translations)}/{len(batch)} values in batch")
+                    translations.update(batch_translations)
+                    if self.translation_cache:
+                        self.translation_cache.set_many(batch_translations, target_language)
                 except Exception as e:
                     logger.error(f"❌ Error translating batch: {str(e)}")
                     return f"Error translating values: {str(e)}"
             
             # Step 7: Apply translations to create a new column
             logger.debug(f"🔄 Creating new column with translations")
-            df[new_column_name] = df[column_name].map(translations)
-            
-            # Handle values that weren't in the training set (like NaN)
-            df[new_column_name] = df[new_column_name].fillna(df[column_name])
+            df[new_column_name] = _apply_translations(df[column_name].astype('category'), translations)
             
             # Step 8: Update the database with the new DataFrame
             self.data_handler.update_df_and_db(df)
@@ -2884,56 +3755,46 @@ Keep the analysis concise but thorough, focusing on business value and practical
         
         try:
             # Step 1: Analyze the request to determine which columns to translate and target language
-            analysis_prompt = f"""
-            Analyze this bulk translation request: "{question}"
-            
-            Available columns in the dataset: {', '.join(df.columns)}
+            fast_analysis = _parse_simple_bulk_translation(question)
+            if fast_analysis is not None:
+                logger.debug(f"⚡ Parsed bulk translation request without LLM: {fast_analysis}")
+                columns_spec = fast_analysis['columns_to_translate']
+                target_language = fast_analysis['target_language']
+                skip_numeric = fast_analysis['skip_numeric_columns']
+            else:
+                analysis_prompt = f"""
+                Analyze this bulk translation request: "{question}"
             
-            Extract the following information:
-            1. Which columns should be translated? Options:
-               - "all" for all columns
-               - ["col1", "col2"] for specific columns
-               - "range:A-E" for a range of columns (A through E)
-               - "first:5" for first N columns
-               - "last:3" for last N columns
-            2. What is the target language? (default: English)
-            3. Should we skip columns that appear to contain only numbers/IDs?
-            
-            Return your analysis in this exact JSON format:
-            {{
-                "columns_to_translate": "all" or ["column1", "column2"] or "range:A-E" or "first:5" or "last:3",
-                "target_language": "English",
-                "skip_numeric_columns": true,
-                "reasoning": "Brief explanation of your analysis"
-            }}
-            """
+                Available columns in the dataset: {', '.join(df.columns)}
+                """
             
-            analysis_response = self.llm.invoke(analysis_prompt)
-            try:
-                # Parse the JSON response - handle markdown code blocks
-                import json
-                response_content = analysis_response.content.strip()
+                analysis_response = self.llm.invoke([
+                    SystemMessage(content=BULK_TRANSLATION_ANALYSIS_SYSTEM_PROMPT),
+                    HumanMessage(content=analysis_prompt),
+                ])
+                try:
+                    # Parse the JSON response - handle markdown code blocks
+                    response_content = analysis_response.content.strip()
                 
-                # Remove markdown code block formatting if present
-                response_content = re.sub(r'^```(?:json)?\s*', '', response_content, flags=re.IGNORECASE | re.MULTILINE)
-                response_content = re.sub(r'```$', '', response_content, flags=re.MULTILINE)
-                response_content = response_content.strip()
+                    # Remove markdown code block formatting if present
+                    response_content = _RE_JSON_FENCE_OPEN.sub('', response_content)
+                    response_content = _RE_FENCE_CLOSE.sub('', response_content)
+                    response_content = response_content.strip()
                 
-                analysis = json.loads(response_content)
-                logger.debug(f"🔍 Bulk translation analysis: {analysis}")
+                    analysis = _loads_json(response_content)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("🔍 Bulk translation analysis: %s", analysis)
                 
-                columns_spec = analysis.get('columns_to_translate', 'all')
-                target_language = analysis.get('target_language', 'English')
-                skip_numeric = analysis.get('skip_numeric_columns', True)
-                reasoning = analysis.get('reasoning', '')
+                    columns_spec = analysis.get('columns_to_translate', 'all')
+                    target_language = analysis.get('target_language', 'English')
+                    skip_numeric = analysis.get('skip_numeric_columns', True)
                 
-            except (json.JSONDecodeError, Exception) as e:
-                logger.error(f"❌ Failed to parse LLM response as JSON: {str(e)}")
-                # Default fallback
-                columns_spec = 'all'
-                target_language = 'English'
-                skip_numeric = True
-                reasoning = "Using default settings due to parsing error."
+                except (json.JSONDecodeError, Exception) as e:
+                    logger.error(f"❌ Failed to parse LLM response as JSON: {str(e)}")
+                    # Default fallback
+                    columns_spec = 'all'
+                    target_language = 'English'
+                    skip_numeric = True
             
             # Step 2: Determine which columns to translate based on the specification
             columns_to_translate = []
@@ -2967,17 +3828,10 @@ Keep the analysis concise but thorough, focusing on business value and practical
             
             # Step 3: Filter out numeric/ID columns if requested
             if skip_numeric:
-                text_columns = []
-                for col in columns_to_translate:
-                    # Check if column contains mostly text data
-                    sample_values = df[col].dropna().head(10)
-                    if len(sample_values) > 0:
-                        # Check if most values are strings and not just numbers
-                        text_count = sum(1 for val in sample_values if isinstance(val, str) and not str(val).replace('.', '').replace('-', '').isdigit())
-                        if text_count > len(sample_values) * 0.5:  # More than 50% are text
-                            text_columns.append(col)
-                        else:
-                            logger.debug(f"🔢 Skipping column '{col}' - appears to contain mostly numeric/ID data")
+                text_columns = _select_text_columns(df, columns_to_translate)
+                skipped = [col for col in columns_to_translate if col not in text_columns]
+                if skipped:
+                    logger.debug(f"🔢 Skipping columns {skipped} - appear to contain mostly numeric/ID data")
                 columns_to_translate = text_columns
             
             if not columns_to_translate:
@@ -2986,104 +3840,90 @@ Keep the analysis concise but thorough, focusing on business value and practical
             logger.debug(f"📋 Columns to translate: {columns_to_translate}")
             logger.debug(f"🌍 Target language: {target_language}")
             
-            # Step 4: Create a copy of the dataframe to work with
-            df_working = df.copy()
+            # Step 4: Shallow copy shares the original column data; only new translated columns are added
+            df_working = df.copy(deep=False)
             translation_results = []
             total_translations = 0
             
-            # Step 5: Process each column for translation
-            for col_idx, column_name in enumerate(columns_to_translate):
-                logger.debug(f"🔄 Processing column {col_idx + 1}/{len(columns_to_translate)}: {column_name}")
+            # Step 5: Collect the distinct values across ALL columns so shared values are translated once
+            new_column_names = {}
+            categorical_columns = {}
+            for column_name in columns_to_translate:
+                # One categorization per column gives its distinct values and makes empty columns obvious
+                cat_col = df_working[column_name].astype('category')
+                if len(cat_col.cat.categories) == 0:
+                    logger.debug(f"⚠️ Column '{column_name}' has no data to translate, skipping")
+                    continue
+                categorical_columns[column_name] = cat_col
                 
                 # Create new column name for translated data
                 new_column_name = f"{column_name}_Translated"
                 counter = 1
-                while new_column_name in df_working.columns:
+                while new_column_name in df_working.columns or new_column_name in new_column_names.values():
                     new_column_name = f"{column_name}_Translated_{counter}"
                     counter += 1
-                
-                # Get unique values to translate (for efficiency)
-                unique_values = df_working[column_name].dropna().unique()
-                logger.debug(f"🔢 Found {len(unique_values)} unique values in '{column_name}'")
-                
-                if len(unique_values) == 0:
-                    logger.debug(f"⚠️ Column '{column_name}' has no data to translate, skipping")
-                    continue
-                
-                # Translate in batches
-                translations = {}
-                batch_size = 20  # Smaller batch size for bulk operations
-                
-                for i in range(0, len(unique_values), batch_size):
-                    batch = unique_values[i:i+batch_size]
-                    
-                    # Create a numbered list for clear value identification
-                    batch_text = "\n".join([f"{j+1}. {value}" for j, value in enumerate(batch)])
-                    
-                    translation_prompt = f"""
-                    Translate the following {len(batch)} values from column '{column_name}' to {target_language}.
-                    Maintain the same structure and format, just translate the text.
-                    If a value appears to be a code, ID, or number, keep it unchanged.
-                    
-                    Values to translate:
-                    {batch_text}
-                    
-                    Return ONLY the translations as a numbered list matching the original numbering, like this:
-                    1. [translation1]
-                    2. [translation2]
-                    ...and so on.
-                    """
-                    
-                    try:
-                        translation_response = self.llm.invoke(translation_prompt).content.strip()
+                new_column_names[column_name] = new_column_name
+            
+            if not categorical_columns:
+                return "No text values found to translate."
+            
+            global_unique = pd.unique(np.concatenate(
+                [cat_col.cat.categories.to_numpy(dtype=object) for cat_col in categorical_columns.values()]
+            ))
+            logger.debug(f"🔢 Found {len(global_unique)} distinct values across {len(new_column_names)} columns")
+            
+            # Reuse cached translations and only send the misses to the LLM
+            global_map = self.translation_cache.get_many(global_unique, target_language) if self.translation_cache else {}
+            total_translations += len(global_map)
+            pending_values = [value for value in global_unique if value not in global_map]
+            logger.debug(f"💾 Translation cache: {len(global_map)} hits, {len(pending_values)} misses")
+            
+            # Translate the mega-batches concurrently, one LLM call per BULK_TRANSLATION_BATCH_SIZE values.
+            # A bounded thread pool keeps provider rate limits in check; process_query is called
+            # synchronously from inside the server's event loop, so asyncio.run is not an option here.
+            batch_size = BULK_TRANSLATION_BATCH_SIZE
+            batches = [pending_values[i:i+batch_size] for i in range(0, len(pending_values), batch_size)]
+            if batches:
+                logger.debug(f"🔄 Dispatching {len(batches)} mega-batches with up to {BULK_TRANSLATION_MAX_CONCURRENCY} in flight")
+                with ThreadPoolExecutor(max_workers=min(BULK_TRANSLATION_MAX_CONCURRENCY, len(batches))) as executor:
+                    futures = {
+                        executor.submit(self._translate_bulk_batch, batch, target_language): (batch_number, batch)
+                        for batch_number, batch in enumerate(batches, 1)
+                    }
+                    for future in as_completed(futures):
+                        batch_number, batch = futures[future]
+                        try:
+                            batch_result = future.result()
+                        except Exception as e:
+                            logger.error(f"❌ Error translating mega-batch {batch_number}: {str(e)}")
+                            # Continue with other batches even if one fails
+                            continue
                         
-                        # Parse the response to get translations
-                        translation_lines = translation_response.split('\n')
-                        for j, line in enumerate(translation_lines):
-                            if j >= len(batch):
-                                break
-                                
-                            # Extract just the translated value, removing numbering
-                            match = re.match(r'^\d+\.\s*(.*?)$', line.strip())
-                            if match:
-                                translated_value = match.group(1).strip()
-                                original_value = batch[j]
-                                translations[original_value] = translated_value
-                                total_translations += 1
-                    except Exception as e:
-                        logger.error(f"❌ Error translating batch for column '{column_name}': {str(e)}")
-                        # Continue with other columns even if one fails
-                        continue
-                
-                # Apply translations to create new column
-                if translations:
-                    df_working[new_column_name] = df_working[column_name].map(translations)
-                    # Handle values that weren't translated (like NaN)
-                    df_working[new_column_name] = df_working[new_column_name].fillna(df_working[column_name])
+                        batch_translations = {}
+                        for j, original_value in enumerate(batch, 1):
+                            translated_value = batch_result.get(str(j))
+                            if translated_value is not None:
+                                batch_translations[original_value] = str(translated_value).strip()
+                        global_map.update(batch_translations)
+                        total_translations += len(batch_translations)
+                        if self.translation_cache:
+                            self.translation_cache.set_many(batch_translations, target_language)
+            
+            # Apply the shared translation map to create new columns
+            if global_map:
+                for column_name, new_column_name in new_column_names.items():
+                    df_working[new_column_name] = _apply_translations(categorical_columns[column_name], global_map)
                     translation_results.append(f"'{column_name}' → '{new_column_name}'")
                     logger.debug(f"✅ Created translated column: {new_column_name}")
             
             if not translation_results:
                 return "No translations were completed. Please check your data and try again."
             
-            # Step 6: Reorder columns to place all translated columns after all originals
-            new_column_order = []
-            translated_columns = [col for col in df_working.columns if col.endswith('_Translated')]
-            
-            # First, add all original columns (untranslated)
-            for original_col in df.columns:
-                new_column_order.append(original_col)
-            
-            # Then, add all translated columns in the same order as their originals
-            for original_col in df.columns:
-                for trans_col in translated_columns:
-                    if trans_col.startswith(f"{original_col}_Translated"):
-                        new_column_order.append(trans_col)
-            
-            # Add any remaining translated columns that didn't match the pattern
-            for trans_col in translated_columns:
-                if trans_col not in new_column_order:
-                    new_column_order.append(trans_col)
+            # Step 6: Reorder columns to place all translated columns after all originals,
+            # in the same order as their originals (new_column_names maps original -> translated)
+            new_column_order = list(df.columns) + [
+                new_column_names[original_col] for original_col in df.columns if original_col in new_column_names
+            ]
             
             # Reorder the dataframe
             df_working = df_working[new_column_order]
@@ -3107,6 +3947,38 @@ Keep the analysis concise but thorough, focusing on business value and practical
             logger.exception("Full exception details:")
             return f"Error processing bulk translation request: {str(e)}"
 
+    def _translate_bulk_batch(self, batch: list, target_language: str) -> Dict[str, str]:
+        """
+        Translate one mega-batch of distinct values with a single LLM call.
+        
+        Returns:
+            Dictionary mapping the 1-based item id (as a string) to its translation
+        """
+        batch_text = _build_numbered_batch_text(batch)
+        translation_prompt = BULK_TRANSLATE_PROMPT.format(
+            n=len(batch),
+            target_language=target_language,
+            batch_text=batch_text,
+        )
+        return self._invoke_translation_json(TRANSLATE_SYSTEM_PROMPT, translation_prompt)
+
+    def _invoke_translation_json(self, system_prompt: str, translation_prompt: str) -> Dict[str, str]:
+        """Run a translation prompt and parse the JSON object mapping item numbers to translations"""
+        # Stream the reply and stop reading as soon as the JSON object is complete
+        stream = self.llm.stream([
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=translation_prompt),
+        ])
+        try:
+            response_content = _collect_streamed_json_object(chunk.content for chunk in stream).strip()
+        finally:
+            stream.close()
+        
+        # Remove markdown code block formatting if present
+        response_content = _RE_JSON_FENCE_OPEN.sub('', response_content)
+        response_content = _RE_FENCE_CLOSE.sub('', response_content)
+        return _loads_json(response_content.strip())
+
     def _check_duplicates_simple(self, question: str, df: pd.DataFrame) -> str:
         """
         Simple duplicate checking without removal.
@@ -3124,8 +3996,8 @@ Keep the analysis concise but thorough, focusing on business value and practical
             return "No data loaded or data is empty, cannot check for duplicates."
         
         try:
-            # Simple duplicate count
-            num_duplicates = df.duplicated().sum()
+            # Simple duplicate count, hash-narrowed and confirmed exactly
+            num_duplicates = _duplicated_mask(df).sum()
             total_rows = len(df)
             
             if num_duplicates > 0:
@@ -3157,32 +4029,13 @@ Keep the analysis concise but thorough, focusing on business value and practical
             return "No data loaded or data is empty, cannot check or remove duplicates."
             
         # --- Intent detection ---
-        check_patterns = [
-            r'are there any duplicates',
-            r'does.*have duplicates',
-            r'how many duplicates',
-            r'count.*duplicates',
-            r'find.*duplicates',
-            r'any duplicate',
-            r'list.*duplicates',
-            r'which.*duplicates',
-            r'show.*duplicates',
-            r'get.*duplicates',
-        ]
-        remove_patterns = [
-            r'remove duplicate',
-            r'drop duplicate',
-            r'deduplicate',
-            r'delete duplicate',
-            r'eliminate duplicate',
-        ]
         question_lower = question.lower()
-        is_check = any(re.search(p, question_lower) for p in check_patterns)
-        is_remove = any(re.search(p, question_lower) for p in remove_patterns)
+        is_check = bool(_RE_DUPLICATE_CHECK_INTENT.search(question_lower))
+        is_remove = bool(_RE_DUPLICATE_REMOVE_INTENT.search(question_lower))
 
         if is_check and not is_remove:
             # Only check for duplicates, do not remove
-            num_duplicates = df.duplicated().sum()
+            num_duplicates = _duplicated_mask(df).sum()
             if num_duplicates > 0:
                 return f"There are {num_duplicates} duplicate rows in your data."
             else:
@@ -3191,22 +4044,9 @@ Keep the analysis concise but thorough, focusing on business value and practical
         # --- Existing code for removal ---
         try:
             # Step 1: Use LLM to analyze the request and determine deduplication parameters
-            analysis_prompt = f"""
-            Analyze this duplicate removal request: "{question}"
-            
-            Available columns in the dataset: {', '.join(df.columns)}
-            
-            Extract the following information:
-            1. What columns should be used for detecting duplicates? If not specified, respond with "all columns".
-            2. What keep strategy should be used? Options are 'first' (default), 'last', or 'none' (remove all duplicates).
-            
-            Return your analysis in this exact JSON format:
-            {{
-                "subset_columns": ["column1", "column2"] or null if all columns should be used,
-                "keep_strategy": "first" or "last" or false (for 'none'),
-                "reasoning": "Brief explanation of your analysis"
-            }}
-            """
+            analysis_prompt = f"""Duplicate removal request: "{question}"
+Columns: {', '.join(df.columns)}
+Return ONLY JSON: {{"subset_columns": [column names] or null for all columns, "keep_strategy": "first" | "last" | false}}"""
             
             analysis_response = self.llm.invoke(analysis_prompt)
             try:
@@ -3215,16 +4055,16 @@ Keep the analysis concise but thorough, focusing on business value and practical
                 response_content = analysis_response.content.strip()
                 
                 # Remove markdown code block formatting if present
-                response_content = re.sub(r'^```(?:json)?\s*', '', response_content, flags=re.IGNORECASE | re.MULTILINE)
-                response_content = re.sub(r'```$', '', response_content, flags=re.MULTILINE)
+                response_content = _RE_JSON_FENCE_OPEN.sub('', response_content)
+                response_content = _RE_FENCE_CLOSE.sub('', response_content)
                 response_content = response_content.strip()
                 
-                analysis = json.loads(response_content)
-                logger.debug(f"🔍 Deduplication analysis: {analysis}")
+                analysis = _loads_json(response_content)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("🔍 Deduplication analysis: %s", analysis)
                 
                 subset_columns = analysis.get('subset_columns')
                 keep_strategy = analysis.get('keep_strategy')
-                reasoning = analysis.get('reasoning', '')
                 
                 # IMPORTANT: Ensure we always keep at least one instance of each duplicate
                 # Only allow 'first' or 'last' as keep_strategy, never False (which would drop all duplicates)
@@ -3251,10 +4091,9 @@ Keep the analysis concise but thorough, focusing on business value and practical
                 # Extract column information manually and initialize variables
                 subset_columns = None
                 keep_strategy = 'first'  # Default value to avoid variable scope issues
-                reasoning = "Extracted from question using pattern matching."
                 
             # Move column_match outside the try block to fix scope issue
-            column_match = re.search(r'(?:based on|using|with|for|in|from|of|by)\s+(?:column(?:s)?\s+)?([A-Za-z0-9_,\s]+)', question.lower())
+            column_match = _RE_COLUMN_REFERENCE.search(question.lower())
             
             if column_match:
                 # Extract column names or references
@@ -3290,24 +4129,18 @@ Keep the analysis concise but thorough, focusing on business value and practical
                 # Count duplicates before removal
                 original_count = len(df)
                 
-                # First, let's properly check for duplicates
-                if subset_columns:
-                    duplicated_mask = df.duplicated(subset=subset_columns, keep=False)
-                    total_duplicated_rows = duplicated_mask.sum()
-                    num_duplicate_sets = df[duplicated_mask].groupby(subset_columns).size().count() if total_duplicated_rows > 0 else 0
-                    
-                    # Apply drop_duplicates with the appropriate keep strategy
-                    df_deduped = df.drop_duplicates(subset=subset_columns, keep=keep_strategy)
-                else:
-                    duplicated_mask = df.duplicated(keep=False)
-                    total_duplicated_rows = duplicated_mask.sum()
-                    num_duplicate_sets = len(df[duplicated_mask].drop_duplicates()) if total_duplicated_rows > 0 else 0
-                    
-                    # Apply drop_duplicates with the appropriate keep strategy
-                    df_deduped = df.drop_duplicates(keep=keep_strategy)
+                # Hash the rows once for candidates, then derive every mask and count from the
+                # exact (df.duplicated-confirmed) duplicate mask
+                duplicated_mask = _duplicated_mask(df, subset_columns, keep=False)
+                total_duplicated_rows = duplicated_mask.sum()
+                
+                # Keep one row per duplicate set according to the keep strategy
+                df_deduped = df[~_duplicated_mask(df, subset_columns, keep=keep_strategy, candidates=duplicated_mask)]
                 
                 new_count = len(df_deduped)
                 rows_removed = original_count - new_count
+                # Each set keeps exactly one row, so sets = flagged rows - removed rows
+                num_duplicate_sets = total_duplicated_rows - rows_removed
             
                 # Enhanced logging for better debugging
                 logger.debug(f"📊 Direct deduplication analysis:")
@@ -3320,13 +4153,10 @@ Keep the analysis concise but thorough, focusing on business value and practical
                 # Additional validation - show sample duplicates if any exist
                 if total_duplicated_rows > 0:
                     logger.debug("🔍 Sample duplicate rows found:")
-                    if subset_columns:
-                        sample_duplicates = df[df.duplicated(subset=subset_columns, keep=False)].head(5)
-                    else:
-                        sample_duplicates = df[df.duplicated(keep=False)].head(5)
+                    sample_duplicates = df[duplicated_mask].head(5)
                     logger.debug(f"   Sample duplicates shape: {sample_duplicates.shape}")
-                    for idx, row in sample_duplicates.iterrows():
-                        logger.debug(f"   Row {idx}: {dict(row)}")
+                    for idx, row_values in sample_duplicates.to_dict(orient='index').items():
+                        logger.debug(f"   Row {idx}: {row_values}")
                 else:
                     logger.debug("✅ No duplicate rows detected in the dataset")
             
@@ -3347,8 +4177,10 @@ Keep the analysis concise but thorough, focusing on business value and practical
                         
                         return response
                     else:
-                        # Let's also do a comprehensive duplicate check before returning
-                        comprehensive_check = self._comprehensive_duplicate_check(df, subset_columns)
+                        # The comprehensive check is debugging detail, so only build it when debug logging is on
+                        comprehensive_check = ""
+                        if logger.isEnabledFor(logging.DEBUG):
+                            comprehensive_check = self._comprehensive_duplicate_check(df, subset_columns, duplicated_mask)
                         return f"No duplicate rows found in the dataset based on the specified criteria. {comprehensive_check}"
                 else:
                     logger.error("❌ Direct deduplication failed")
@@ -3382,41 +4214,31 @@ Keep the analysis concise but thorough, focusing on business value and practical
             logger.exception("Full exception details:")
             return f"Error processing duplicate removal request: {str(e)}"
     
-    def _comprehensive_duplicate_check(self, df: pd.DataFrame, subset_columns=None) -> str:
+    def _comprehensive_duplicate_check(self, df: pd.DataFrame, subset_columns=None, dup_mask=None) -> str:
         """Perform a comprehensive duplicate check for debugging purposes."""
         try:
             total_rows = len(df)
             
+            # Reuse the caller's exact duplicate mask when available instead of rescanning the frame
+            if dup_mask is None:
+                dup_mask = _duplicated_mask(df, subset_columns, keep=False)
+            total_dups = dup_mask.sum()
+            unique_count = total_rows - _duplicated_mask(df, subset_columns, candidates=dup_mask).sum()
+            
             if subset_columns:
-                # Check duplicates based on specified columns
-                dup_mask = df.duplicated(subset=subset_columns, keep=False)
-                total_dups = dup_mask.sum()
-                unique_count = df.drop_duplicates(subset=subset_columns).shape[0]
-                
                 check_result = f"\n📊 Comprehensive check (columns: {', '.join(subset_columns)}): "
-                check_result += f"{total_rows} total rows, {unique_count} unique, {total_dups} flagged as duplicates."
             else:
-                # Check duplicates across all columns
-                dup_mask = df.duplicated(keep=False)
-                total_dups = dup_mask.sum()
-                unique_count = df.drop_duplicates().shape[0]
-                
                 check_result = f"\n📊 Comprehensive check (all columns): "
-                check_result += f"{total_rows} total rows, {unique_count} unique, {total_dups} flagged as duplicates."
+            check_result += f"{total_rows} total rows, {unique_count} unique, {total_dups} flagged as duplicates."
             
             # If duplicates exist, show sample
             if total_dups > 0:
-                if subset_columns:
-                    sample_dups = df[df.duplicated(subset=subset_columns, keep=False)].head(3)
-                else:
-                    sample_dups = df[df.duplicated(keep=False)].head(3)
+                sample_dups = df[dup_mask].head(3)
                 
                 check_result += f"\n🔍 Sample duplicates found:"
-                for idx, row in sample_dups.iterrows():
-                    if subset_columns:
-                        sample_data = {col: row[col] for col in subset_columns}
-                    else:
-                        sample_data = dict(row.head(3))  # Show first 3 columns
+                # Show the subset columns, or the first 3 columns
+                sample_columns = sample_dups[subset_columns] if subset_columns else sample_dups.iloc[:, :3]
+                for idx, sample_data in sample_columns.to_dict(orient='index').items():
                     check_result += f"\n   Row {idx}: {sample_data}"
             
             return check_result
@@ -3432,8 +4254,12 @@ Keep the analysis concise but thorough, focusing on business value and practical
         Returns:
             A string response with the query results or error message
         """
-        logger.debug(f"🔍 === EXECUTE SQL QUERY DIRECTLY ===")
-        logger.debug(f"💬 Question: {question}")
+        # Bind hot lookups once; debug messages use lazy %-formatting so large SQL and
+        # result strings are only rendered when debug logging is enabled
+        debug = logger.debug
+        invoke = self.llm.invoke
+        debug("🔍 === EXECUTE SQL QUERY DIRECTLY ===")
+        debug("💬 Question: %s", question)
         if self.agent_executor is None:
             return "SQL agent is not initialized. Please try again later."
         try:
@@ -3443,6 +4269,7 @@ Keep the analysis concise but thorough, focusing on business value and practical
                 df = self.data_handler.get_df()
                 if df is not None:
                     column_names = list(df.columns)
+            memory_context = self.memory_buffer.render()
             # Step 1: Generate SQL Query from the natural language question
             sql_prompt = f"""
             Generate a single SQL query to answer this question about the data: "{question}"
@@ -3468,141 +4295,81 @@ Keep the analysis concise but thorough, focusing on business value and practical
             
             Query:
             """
+            if memory_context:
+                # Only the compact slots from the previous query, so follow-ups can refer back to it
+                sql_prompt = f"Previous query context (JSON, use only if the question follows up on it): {memory_context}\n" + sql_prompt
             # Get SQL query from LLM
-            sql_response = self.llm.invoke(sql_prompt)
+            sql_response = invoke(sql_prompt)
             sql_query = sql_response.content.strip()
-            # --- Remove markdown code block formatting if present ---
-            sql_query = re.sub(r'^```(?:sql)?\s*', '', sql_query, flags=re.IGNORECASE | re.MULTILINE)
-            sql_query = re.sub(r'```$', '', sql_query, flags=re.MULTILINE)
-            sql_query = sql_query.strip()
-            logger.debug(f"🔍 Generated SQL Query (pre-rewrite): {sql_query}")
-            # --- Post-process to force table name to 'data' ---
-            sql_query = re.sub(r'(FROM|from)\s+\w+', 'FROM data', sql_query)
-            sql_query = re.sub(r'(JOIN|join)\s+\w+', 'JOIN data', sql_query)
-            logger.debug(f"🔍 Generated SQL Query (post-rewrite): {sql_query}")
+            debug("🔍 Generated SQL Query (pre-rewrite): %s", sql_query)
+            # --- Strip code fences, force table name to 'data' and bound the result size ---
+            sql_query = _sanitize_generated_sql(sql_query)
+            debug("🔍 Generated SQL Query (post-rewrite): %s", sql_query)
+            self.memory_buffer.write("last_sql", sql_query)
             
             # Step 2: Execute the SQL query
-            # Get the SQL database object
-            db = self.data_handler.get_db_sqlalchemy_object()
-            
-            # Check what type of object we're dealing with
-            logger.debug(f"Database object type: {type(db)}")
+            sql_executor = self._get_sql_executor()
+            if sql_executor is None:
+                # COMMENTED OUT: Agent executor fallback - user now controls mode selection
+                # Fall back to using the agent executor
+                # enhanced_question = f"""
+                # Answer this question about the data: "{question}"
+                # 
+                # IMPORTANT: When querying the data, include relevant context columns such as:
+                # - For games: name, developer, publisher, release_date, positive_ratings, negative_ratings
+                # - For ratings: both positive and negative ratings for comparison
+                # - For sales/owners: include price and other relevant metrics
+                # 
+                # Provide a complete answer that includes all relevant context from the data.
+                # """
+                # agent_response = self.agent_executor.invoke({"input": enhanced_question})["output"]
+                # # Format the response to ensure it's contextual and helpful
+                # return self._format_sql_response(agent_response, question)
+                
+                # Return error instead of automatic fallback
+                return "Unable to process query with direct SQL. Please try Complex mode if you need advanced analysis."
             
-            # Use the appropriate method to run the query based on the object type
-            rows = []
-            columns = []
+            executor_kind, execute = sql_executor
             
-            # Use LangChain's built-in run method if available (for SQLDatabase)
-            if hasattr(db, "run"):
-                logger.debug("Using db.run() method for SQLDatabase object")
-                result = db.run(sql_query)
-                
-                # The result is likely a string, so we need to parse it
-                logger.debug(f"Query result type: {type(result)}")
-                logger.debug(f"Query result: {result}")
-                
-                # COMMENTED OUT: Agent executor fallback - using direct SQL results instead
-                # Since we can't get structured data this way, let's use the agent executor
-                # try:
-                #     enhanced_question = f"""
-                #     Answer this question about the data: "{question}"
-                #     
-                #     IMPORTANT: When querying the data, include relevant context columns such as:
-                #     - For games: name, developer, publisher, release_date, positive_ratings, negative_ratings
-                #     - For ratings: both positive and negative ratings for comparison
-                #     - For sales/owners: include price and other relevant metrics
-                #     
-                #     Provide a complete answer that includes all relevant context from the data.
-                #     """
-                #     agent_response = self.agent_executor.invoke({"input": enhanced_question})["output"]
-                #     # Format the response to ensure it's contextual and helpful
-                #     return self._format_sql_response(agent_response, question)
-                # except Exception as agent_error:
-                #     logger.error(f"Error using agent executor: {str(agent_error)}")
-                #     return "I had trouble querying your data. Could you try rephrasing your question or check if your dataset is properly formatted?"
+            if executor_kind == "run":
+                # LangChain's SQLDatabase.run returns the result as a string
+                result = execute(sql_query)
+                debug("Query result type: %s", type(result))
+                debug("Query result: %s", result)
                 
                 # Process and format the direct SQL result
                 return self._format_direct_sql_result(result, question, sql_query)
-                
-            # Use SQLAlchemy's connect method if available
-            elif hasattr(db, "connect"):
-                logger.debug("Using db.connect() method for SQLAlchemy object")
-                from sqlalchemy import text
-                
-                with db.connect() as conn:
-                    result = conn.execute(text(sql_query))
-                    rows = result.fetchall()
-                    columns = result.keys()
-            
-            # Use the engine directly if it's available
-            elif hasattr(db, "engine") and hasattr(db.engine, "connect"):
-                logger.debug("Using db.engine.connect() method")
-                from sqlalchemy import text
-                
-                with db.engine.connect() as conn:
-                    result = conn.execute(text(sql_query))
-                    rows = result.fetchall()
-                    columns = result.keys()
             
-            # If none of the above methods work, try using the execute_query toolkit
-            else:
-                logger.debug("Using execute_query from SQL toolkit")
-                query_tool = [tool for tool in self.agent_executor.tools if hasattr(tool, "name") and tool.name == "sql_db_query"]
-                
-                if query_tool:
-                    result = query_tool[0].run(sql_query)
-                    # Process the result based on its format
-                    logger.debug(f"Query tool result type: {type(result)}")
-                    return result
-                else:
-                    # COMMENTED OUT: Agent executor fallback - user now controls mode selection
-                    # Fall back to using the agent executor
-                    # enhanced_question = f"""
-                    # Answer this question about the data: "{question}"
-                    # 
-                    # IMPORTANT: When querying the data, include relevant context columns such as:
-                    # - For games: name, developer, publisher, release_date, positive_ratings, negative_ratings
-                    # - For ratings: both positive and negative ratings for comparison
-                    # - For sales/owners: include price and other relevant metrics
-                    # 
-                    # Provide a complete answer that includes all relevant context from the data.
-                    # """
-                    # agent_response = self.agent_executor.invoke({"input": enhanced_question})["output"]
-                    # # Format the response to ensure it's contextual and helpful
-                    # return self._format_sql_response(agent_response, question)
-                    
-                    # Return error instead of automatic fallback
-                    return "Unable to process query with direct SQL. Please try Complex mode if you need advanced analysis."
+            if executor_kind == "tool":
+                result = execute(sql_query)
+                debug("Query tool result type: %s", type(result))
+                return result
+            
+            # Step 3: Rows are fetched in batches into a DataFrame
+            columns, result_frame, truncated = execute(sql_query)
+            row_count = len(result_frame)
             
             # Check if we got any results
-            if not rows:
+            if not row_count:
                 return "No data found matching your query."
-                
-            # Step 3: Format results as markdown table
-            table_header = "| " + " | ".join(columns) + " |"
-            table_separator = "| " + " | ".join(["---" for _ in columns]) + " |"
-            
-            table_rows = []
-            for row in rows:
-                # Format each value appropriately
-                formatted_values = []
-                for val in row:
-                    if val is None:
-                        formatted_values.append("NULL")
-                    elif isinstance(val, (int, float)):
-                        # Round float values to whole numbers
-                        if isinstance(val, float):
-                            formatted_values.append(str(round(val)))
-                        else:
-                            formatted_values.append(str(val))
-                    else:
-                        # Escape any pipe characters in strings
-                        formatted_values.append(str(val).replace("|", "\\|"))
-                
-                table_rows.append("| " + " | ".join(formatted_values) + " |")
             
-            # Combine into final table
-            result_table = "\n".join([table_header, table_separator] + table_rows)
+            # Only the rows the summary needs are formatted before the LLM call
+            table = io.StringIO()
+            table.write(f"| {' | '.join(columns)} |\n")
+            table.write(_markdown_table_separator(len(columns)))
+            table.write("\n")
+            table.write(_format_markdown_rows(result_frame.iloc[:SQL_SUMMARY_ROW_CAP]))
+            
+            # Large results would overflow the summary prompt, so the LLM gets a preview
+            # of the table plus statistics computed over every fetched row
+            if row_count > SQL_SUMMARY_ROW_CAP:
+                summary_results = f"""{table.getvalue()}
+            (first {SQL_SUMMARY_ROW_CAP} of {row_count} rows shown)
+            
+            Column statistics across all {row_count} rows:
+            {result_frame.describe(include='all').to_string()}"""
+            else:
+                summary_results = table.getvalue()
             
             # Step 4: Generate a natural language summary of the results
             result_summary_prompt = f"""
@@ -3613,10 +4380,10 @@ Keep the analysis concise but thorough, focusing on business value and practical
             {sql_query}
             ```
             
-            The query returned {len(rows)} rows with the following columns: {', '.join(columns)}
+            The query returned {row_count}{'+' if truncated else ''} rows with the following columns: {', '.join(columns)}
             
             Here are the results:
-            {result_table}
+            {summary_results}
             
             Please provide a concise summary of these results in natural language that directly answers the user's question.
             - Start with a direct answer to the question
@@ -3628,9 +4395,17 @@ Keep the analysis concise but thorough, focusing on business value and practical
             - Just give the facts and insights directly
             """
             
-            # Get summary from LLM
-            summary_response = self.llm.invoke(result_summary_prompt)
-            result_summary = summary_response.content.strip()
+            # Get summary from LLM in the background while the rest of the table is formatted
+            summary_future = self._llm_pool.submit(invoke, result_summary_prompt)
+            
+            if row_count > SQL_SUMMARY_ROW_CAP:
+                table.write("\n")
+                table.write(_format_markdown_rows(result_frame.iloc[SQL_SUMMARY_ROW_CAP:]))
+            if truncated:
+                table.write(f"\n\n_Showing the first {SQL_RESULT_MAX_ROWS} rows; the query returned more._")
+            result_table = table.getvalue()
+            
+            result_summary = summary_future.result().content.strip()
             
             # Step 5: Combine table and summary into final response
             final_response = f"""
@@ -3670,6 +4445,115 @@ Keep the analysis concise but thorough, focusing on business value and practical
             # Return error instead of automatic fallback
             return "Unable to process query with available SQL tools. Please try Complex mode for advanced analysis."
 
+    def _get_sql_executor(self):
+        """
+        Resolve how SQL queries are run against the current database object.
+        
+        The decision only depends on the database object and the agent tools, so it is
+        made once and reused until the database object changes.
+        
+        Returns:
+            Tuple of (kind, callable) where kind is "run", "connect" or "tool", or None
+            if no way of executing SQL is available
+        """
+        db = self.data_handler.get_db_sqlalchemy_object() if self.data_handler else None
+        if self._sql_executor is not None and self._sql_executor_db is db:
+            return self._sql_executor
+        
+        logger.debug("Database object type: %s", type(db))
+        self._close_sql_connection()
+        executor = None
+        
+        # Use LangChain's built-in run method if available (for SQLDatabase)
+        if hasattr(db, "run"):
+            logger.debug("Using db.run() method for SQLDatabase object")
+            executor = ("run", db.run)
+        
+        # Use SQLAlchemy's connect method, or the engine directly if it's available
+        elif hasattr(db, "connect") or (hasattr(db, "engine") and hasattr(db.engine, "connect")):
+            from sqlalchemy import text
+            connectable = db if hasattr(db, "connect") else db.engine
+            logger.debug(f"Using {'db' if connectable is db else 'db.engine'}.connect() method for SQLAlchemy object")
+            
+            def execute_with_connection(sql_query):
+                # One connection is opened per database object and reused across queries;
+                # stream_results lets server-backed drivers use server-side cursors
+                with self._sql_connection_lock:
+                    conn = self._sql_connection
+                    if conn is None or conn.closed:
+                        conn = connectable.connect().execution_options(stream_results=True)
+                        self._sql_connection = conn
+                    try:
+                        # Fetch in batches so memory stays bounded regardless of the result size
+                        result = conn.execute(text(sql_query))
+                        columns = tuple(str(column) for column in result.keys())
+                        frames = []
+                        row_count = 0
+                        truncated = False
+                        while True:
+                            batch = result.fetchmany(SQL_RESULT_FETCH_SIZE)
+                            if not batch:
+                                break
+                            remaining = SQL_RESULT_MAX_ROWS - row_count
+                            if len(batch) > remaining:
+                                batch = batch[:remaining]
+                                truncated = True
+                            if batch:
+                                frames.append(pd.DataFrame([tuple(row) for row in batch], columns=columns))
+                                row_count += len(batch)
+                            if truncated:
+                                break
+                        result.close()
+                        result_frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+                        return columns, result_frame, truncated
+                    finally:
+                        # End the read transaction so writers are not blocked between queries
+                        conn.rollback()
+            
+            executor = ("connect", execute_with_connection)
+        
+        # If none of the above methods work, try using the execute_query toolkit
+        elif self.agent_executor is not None:
+            logger.debug("Using execute_query from SQL toolkit")
+            query_tool = next((tool for tool in self.agent_executor.tools if getattr(tool, "name", None) == "sql_db_query"), None)
+            if query_tool is not None:
+                executor = ("tool", query_tool.run)
+        
+        if executor is not None:
+            self._sql_executor = executor
+            self._sql_executor_db = db
+        return executor
+
+    def _close_sql_connection(self):
+        """Close the reused direct SQL connection, if one is open"""
+        with self._sql_connection_lock:
+            if self._sql_connection is not None:
+                try:
+                    self._sql_connection.close()
+                except Exception as e:
+                    logger.warning(f"⚠️ Error closing SQL connection: {str(e)}")
+                self._sql_connection = None
+
+    def _invoke_format_llm(self, prompt: str) -> str:
+        """
+        Run a result-formatting prompt through the LLM, reusing earlier replies.
+        
+        The formatting prompts are fully determined by the question and the data they
+        embed, so an identical prompt can be answered from the LRU cache.
+        """
+        prompt_key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+        cached = self._format_cache.get(prompt_key)
+        if cached is not None:
+            self._format_cache.move_to_end(prompt_key)
+            logger.debug("⚡ Format cache hit, skipping LLM call")
+            return cached
+        
+        response = self.llm.invoke(prompt).content.strip()
+        self._format_cache[prompt_key] = response
+        if len(self._format_cache) > self.FORMAT_CACHE_MAX_SIZE:
+            self._format_cache.popitem(last=False)
+        return response
+
     def _format_direct_sql_result(self, result: str, question: str, sql_query: str) -> str:
         """
         Format direct SQL result into a user-friendly response.
@@ -3684,33 +4568,29 @@ Keep the analysis concise but thorough, focusing on business value and practical
         """
         try:
             # Log the raw result for debugging
-            logger.debug(f"🔍 Formatting direct SQL result: {result}")
+            logger.debug("🔍 Formatting direct SQL result: %s", result)
             
             # Handle empty or "I don't know" results
             if not result or result.strip().lower() in ['i don\'t know', 'none', '']:
                 return f"I couldn't find any data to answer your question: '{question}'. Please make sure your data is properly loaded and try rephrasing your question."
             
+            # Single numeric results (counts, sums, averages) need no LLM to be stated
+            scalar = _parse_scalar_sql_result(result)
+            if scalar is not None:
+                if isinstance(scalar, float) and not scalar.is_integer():
+                    # Two decimals for ordinary magnitudes; significant digits keep small
+                    # averages and ratios (0.0042) from collapsing to 0.00
+                    formatted_value = f"{scalar:,.2f}" if abs(scalar) >= 1 else f"{scalar:.4g}"
+                else:
+                    formatted_value = f"{int(scalar):,}"
+                logger.debug("⚡ Scalar SQL result, skipping LLM formatting: %s", formatted_value)
+                return f"The answer to '{question}' is **{formatted_value}**."
+            
             # Use LLM to format the result into a clear, grounded response
-            format_prompt = f"""
-            User asked: "{question}"
-            SQL query executed: {sql_query}
-            Raw result from database: {result}
-
-            TASK: Convert the raw SQL result into a clear, readable answer.
-
-            RULES:
-            - ONLY state facts that appear in the raw result above. Do NOT invent, assume, or fabricate any data.
-            - If the result is a count, state the count. If it's a list, present the list clearly.
-            - Use natural language to present the numbers/data from the result.
-            - Round numbers to whole numbers where appropriate.
-            - Keep the response concise (2-4 sentences for simple results, a short list for multiple rows).
-            - Do NOT add "insights", "recommendations", or "what this means for your business".
-            - Do NOT reference data that isn't in the raw result.
-            - If the result is empty or zero, say so clearly.
-            """
+            format_prompt = SQL_FORMAT_DIRECT_RESULT_PROMPT.format(question=question, sql_query=sql_query, result=result)
             
-            formatted_response = self.llm.invoke(format_prompt).content.strip()
-            logger.debug(f"✅ Formatted response: {formatted_response}")
+            formatted_response = self._invoke_format_llm(format_prompt)
+            logger.debug("✅ Formatted response: %s", formatted_response)
             
             return formatted_response
             
@@ -3731,28 +4611,10 @@ Keep the analysis concise but thorough, focusing on business value and practical
             A properly formatted response with context, explanation, and follow-up questions
         """
         # Format the raw response into a clear, grounded answer
-        enhanced_prompt = f"""
-        The user asked: "{question}"
-
-        The data result is: "{raw_response}"
-
-        TASK: Rewrite the data result as a clear, readable answer.
-
-        RULES:
-        - ONLY state facts present in the data result above. Do NOT invent or fabricate any information.
-        - Give a direct answer in 1-2 sentences first.
-        - If there are multiple data points, list them under "Key Details:" using bullet points.
-        - Round numbers to whole numbers where appropriate.
-        - Do NOT add sections like "Why This Matters", "Insights", or "Recommendations".
-        - Do NOT invent statistics, trends, or context not in the result.
-        - If the result is empty, say no matching data was found.
-        - Keep it concise and factual.
-
-        Optionally, suggest 1-2 follow-up questions the user could ask about their data under "Explore Further:".
-        """
+        enhanced_prompt = SQL_FORMAT_RESPONSE_PROMPT.format(question=question, raw_response=raw_response)
         
         try:
-            enhanced_response = self.llm.invoke(enhanced_prompt).content.strip()
+            enhanced_response = self._invoke_format_llm(enhanced_prompt)
             # Convert any literal \n characters to actual newlines for proper markdown rendering
             enhanced_response = enhanced_response.replace('\\n', '\n')
             return enhanced_response
@@ -4001,7 +4863,9 @@ Keep the analysis concise but thorough, focusing on business value and practical
         """
         logger.debug(f"📋 === GETTING AVAILABLE COLUMNS FOR EXTRACTION ===")
         
-        if not self.data_handler or self.data_handler.get_df() is None:
+        # Only read from here, so the stored frame is used without a full copy
+        df = self.data_handler.get_df(copy=False) if self.data_handler else None
+        if df is None:
             return {
                 "success": False,
                 "error": "No data loaded",
@@ -4009,40 +4873,39 @@ Keep the analysis concise but thorough, focusing on business value and practical
             }
         
         try:
-            df = self.data_handler.get_df()
             logger.debug(f"📊 DataFrame shape: {df.shape}")
             
-            columns_info = []
+            # Column statistics are computed for all columns at once;
+            # count() is the non-null count taken straight from each column's buffer
+            total_count = len(df)
+            column_stats = pd.DataFrame({
+                "count": df.count().to_numpy(),
+                "nunique": df.nunique().to_numpy(),
+                "dtype": df.dtypes.astype(str).to_numpy(),
+                "category": df.dtypes.map(_column_data_category).to_numpy(),
+            })
+            if total_count:
+                column_stats["completeness"] = (column_stats["count"] / total_count * 100).round(1)
+            else:
+                column_stats["completeness"] = 0.0
             
-            for col in df.columns:
-                # Get column metadata
-                col_info = {
+            columns_info = [
+                {
                     "name": col,
-                    "type": str(df[col].dtype),
-                    "non_null_count": int(df[col].notna().sum()),
-                    "total_count": len(df),
-                    "unique_count": int(df[col].nunique()),
-                    "sample_values": []
+                    "type": dtype_name,
+                    "non_null_count": int(non_null_count),
+                    "total_count": total_count,
+                    "unique_count": int(unique_count),
+                    # Get sample values (first 3 non-null unique values)
+                    "sample_values": [str(val) for val in _first_unique_values(df.iloc[:, position])],
+                    "completeness_percentage": float(completeness),
+                    # Determine if column appears to be text, numeric, date, etc.
+                    "data_category": data_category,
                 }
-                
-                # Get sample values (first 3 non-null unique values)
-                sample_values = df[col].dropna().unique()[:3]
-                col_info["sample_values"] = [str(val) for val in sample_values]
-                
-                # Calculate completeness percentage
-                col_info["completeness_percentage"] = round((col_info["non_null_count"] / col_info["total_count"]) * 100, 1)
-                
-                # Determine if column appears to be text, numeric, date, etc.
-                if df[col].dtype in ['object', 'string']:
-                    col_info["data_category"] = "Text"
-                elif df[col].dtype in ['int64', 'int32', 'float64', 'float32']:
-                    col_info["data_category"] = "Numeric"
-                elif df[col].dtype in ['datetime64[ns]', 'datetime64']:
-                    col_info["data_category"] = "Date/Time"
-                else:
-                    col_info["data_category"] = "Other"
-                
-                columns_info.append(col_info)
+                for position, (col, non_null_count, unique_count, dtype_name, data_category, completeness) in enumerate(
+                    zip(df.columns, *(column_stats[field] for field in ("count", "nunique", "dtype", "category", "completeness")))
+                )
+            ]
             
             logger.debug(f"✅ Retrieved information for {len(columns_info)} columns")
             
@@ -4076,7 +4939,9 @@ Keep the analysis concise but thorough, focusing on business value and practical
         logger.debug(f"🔧 === EXTRACTING SELECTED COLUMNS ===")
         logger.debug(f"📋 Selected columns: {selected_columns}")
         
-        if not self.data_handler or self.data_handler.get_df() is None:
+        # Only read from here, so the stored frame is used without a full copy
+        df = self.data_handler.get_df(copy=False) if self.data_handler else None
+        if df is None:
             return {
                 "success": False,
                 "error": "No data loaded",
@@ -4091,11 +4956,11 @@ Keep the analysis concise but thorough, focusing on business value and practical
             }
         
         try:
-            df = self.data_handler.get_df()
             logger.debug(f"📊 Original DataFrame shape: {df.shape}")
             
             # Validate that all selected columns exist
-            missing_columns = [col for col in selected_columns if col not in df.columns]
+            available_columns = set(df.columns)
+            missing_columns = [col for col in selected_columns if col not in available_columns]
             if missing_columns:
                 return {
                     "success": False,
@@ -4103,14 +4968,14 @@ Keep the analysis concise but thorough, focusing on business value and practical
                     "sheet_data": None
                 }
             
-            # Extract the selected columns
-            extracted_df = df[selected_columns].copy()
+            # Extract the selected columns; list selection builds a new frame holding
+            # only these columns, and the converter below only reads it
+            extracted_df = df[selected_columns]
             logger.debug(f"📊 Extracted DataFrame shape: {extracted_df.shape}")
             
             # Generate sheet name if not provided
             if not new_sheet_name:
-                import datetime
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 new_sheet_name = f"Extracted_Data_{timestamp}"
             
             # Convert DataFrame to Luckysheet format
@@ -4145,125 +5010,78 @@ Keep the analysis concise but thorough, focusing on business value and practical
                 "sheet_data": None
             }
 
-    def _convert_dataframe_to_luckysheet_format(self, df: pd.DataFrame, sheet_name: str) -> Dict[str, any]:
+    def _convert_dataframe_to_luckysheet_format(self, df: pd.DataFrame, sheet_name: str, use_compact: bool = True) -> Dict[str, any]:
         """
         Convert a pandas DataFrame to Luckysheet-compatible format.
         
+        The compact form carries a "data" matrix of display strings with the header as the
+        first row, which is all the spreadsheet frontend reads and a fraction of the size of
+        celldata. The celldata form (one dict per cell, bold shaded header) is kept for
+        callers that need per-cell attributes.
+        
         Args:
             df: DataFrame to convert
             sheet_name: Name for the sheet
+            use_compact: Emit the "data" matrix instead of "celldata"
             
         Returns:
             Dictionary in Luckysheet format
         """
-        logger.debug(f"🔄 Converting DataFrame to Luckysheet format")
+        logger.debug(f"🔄 Converting DataFrame to Luckysheet format (compact={use_compact})")
         
         try:
+            if use_compact:
+                display_values, _ = _sheet_display_matrix(df)
+                
+                sheet_config = self._luckysheet_sheet_config(sheet_name, len(df), len(df.columns))
+                sheet_config["data"] = [df.columns.astype(str).tolist()] + display_values.tolist()
+                
+                logger.debug(f"✅ Converted to compact Luckysheet format: {len(df) + 1}x{len(df.columns)} cells")
+                return sheet_config
+            
             # Create the cell data in Luckysheet format
             cell_data = []
             
             # Add header row - only for the selected columns
-            for col_idx, column in enumerate(df.columns):
+            header_names = df.columns.astype(str).tolist()
+            for col_idx, header_name in enumerate(header_names):
                 cell_data.append({
                     "r": 0,  # row index
                     "c": col_idx,  # column index
                     "v": {
-                        "v": str(column),  # value
-                        "ct": {"fa": "General", "t": "g"},  # cell type
-                        "m": str(column),  # formatted value
+                        "v": header_name,  # value
+                        "ct": LUCKYSHEET_CT_GENERAL,  # cell type
+                        "m": header_name,  # formatted value
                         "bl": 1,  # bold
                         "bg": "#f0f0f0"  # background color for header
                     }
                 })
             
             # Add data rows - only for the selected columns
-            for row_idx, (_, row) in enumerate(df.iterrows(), start=1):
-                for col_idx, value in enumerate(row):
-                    # Handle different data types
-                    if pd.isna(value):
-                        display_value = ""
-                        cell_type = "g"
-                    elif isinstance(value, (int, float)):
-                        display_value = str(value)
-                        cell_type = "n"  # numeric
-                    else:
-                        display_value = str(value)
-                        cell_type = "g"  # general
-                    
-                    cell_data.append({
-                        "r": row_idx,
-                        "c": col_idx,
-                        "v": {
-                            "v": display_value,
-                            "ct": {"fa": "General", "t": cell_type},
-                            "m": display_value
-                        }
-                    })
+            # Display strings, missing-value mask and numeric (n) vs general (g) cell
+            # types are computed column-wise instead of per cell
+            display_values, na_mask = _sheet_display_matrix(df)
+            column_types = [
+                LUCKYSHEET_CT_NUMERIC if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) else LUCKYSHEET_CT_GENERAL
+                for dtype in df.dtypes
+            ]
+            cell_data.extend(
+                {
+                    "r": row_idx,
+                    "c": col_idx,
+                    "v": {
+                        "v": display_value,
+                        "ct": LUCKYSHEET_CT_GENERAL if is_na else column_types[col_idx],
+                        "m": display_value
+                    }
+                }
+                for row_idx, (row_values, row_na) in enumerate(zip(display_values.tolist(), na_mask.tolist()), start=1)
+                for col_idx, (display_value, is_na) in enumerate(zip(row_values, row_na))
+            )
             
             # Create the sheet configuration - only for the selected columns
-            sheet_config = {
-                "name": sheet_name,
-                "color": "",
-                "index": str(uuid.uuid4()),
-                "status": 1,
-                "order": 0,
-                "hide": 0,
-                "row": len(df) + 1,  # +1 for header
-                "column": len(df.columns),  # Only the selected columns
-                "defaultRowHeight": 19,
-                "defaultColWidth": 73,
-                "celldata": cell_data,
-                "config": {
-                    "merge": {},
-                    "borders": {},
-                    "rowhidden": {},
-                    "colhidden": {},
-                    "rowlen": {},
-                    "columnlen": {},
-                    "customHeight": {},
-                    "customWidth": {}
-                },
-                "scrollLeft": 0,
-                "scrollTop": 0,
-                "luckysheet_select_save": [
-                    {
-                        "left": 0,
-                        "width": 73,
-                        "top": 0,
-                        "height": 19,
-                        "left_move": 0,
-                        "width_move": 73,
-                        "top_move": 0,
-                        "height_move": 19,
-                        "row": [0, 0],
-                        "column": [0, 0],
-                        "row_focus": 0,
-                        "column_focus": 0
-                    }
-                ],
-                "luckysheet_selection_range": [],
-                "zoomRatio": 1,
-                "showGridLines": 1,
-                "dataVerification": {},
-                "hyperlink": {},
-                "dynamicArray": {},
-                "dynamicArray_compute": {},
-                "allowEdit": True,
-                "filter_select": {},
-                "filter": {},
-                "luckysheet_alternateformat_save": [],
-                "luckysheet_alternateformat_save_modelCustom": [],
-                "luckysheet_conditionformat_save": {},
-                "frozen": {},
-                "chart": [],
-                "isPivotTable": False,
-                "pivotTable": {},
-                "image": {},
-                "showRowBar": True,
-                "showColumnBar": True,
-                "sheetFormulaBar": True,
-                "calccain": []
-            }
+            sheet_config = self._luckysheet_sheet_config(sheet_name, len(df), len(df.columns))
+            sheet_config["celldata"] = cell_data
             
             logger.debug(f"✅ Converted to Luckysheet format: {len(cell_data)} cells")
             return sheet_config
@@ -4273,6 +5091,71 @@ Keep the analysis concise but thorough, focusing on business value and practical
             logger.exception("Full exception details:")
             return None
 
+    def _luckysheet_sheet_config(self, sheet_name: str, row_count: int, column_count: int) -> Dict[str, any]:
+        """Luckysheet sheet configuration without cell contents, sized for a header plus row_count rows"""
+        return {
+            "name": sheet_name,
+            "color": "",
+            "index": uuid.uuid4().hex,
+            "status": 1,
+            "order": 0,
+            "hide": 0,
+            "row": row_count + 1,  # +1 for header
+            "column": column_count,  # Only the selected columns
+            "defaultRowHeight": 19,
+            "defaultColWidth": 73,
+            "config": {
+                "merge": {},
+                "borders": {},
+                "rowhidden": {},
+                "colhidden": {},
+                "rowlen": {},
+                "columnlen": {},
+                "customHeight": {},
+                "customWidth": {}
+            },
+            "scrollLeft": 0,
+            "scrollTop": 0,
+            "luckysheet_select_save": [
+                {
+                    "left": 0,
+                    "width": 73,
+                    "top": 0,
+                    "height": 19,
+                    "left_move": 0,
+                    "width_move": 73,
+                    "top_move": 0,
+                    "height_move": 19,
+                    "row": [0, 0],
+                    "column": [0, 0],
+                    "row_focus": 0,
+                    "column_focus": 0
+                }
+            ],
+            "luckysheet_selection_range": [],
+            "zoomRatio": 1,
+            "showGridLines": 1,
+            "dataVerification": {},
+            "hyperlink": {},
+            "dynamicArray": {},
+            "dynamicArray_compute": {},
+            "allowEdit": True,
+            "filter_select": {},
+            "filter": {},
+            "luckysheet_alternateformat_save": [],
+            "luckysheet_alternateformat_save_modelCustom": [],
+            "luckysheet_conditionformat_save": {},
+            "frozen": {},
+            "chart": [],
+            "isPivotTable": False,
+            "pivotTable": {},
+            "image": {},
+            "showRowBar": True,
+            "showColumnBar": True,
+            "sheetFormulaBar": True,
+            "calccain": []
+        }
+
 class DataCleaningAgent:
     """AI-powered data cleaning agent for detecting junk responses in open-text fields."""
     
@@ -4312,14 +5195,41 @@ class DataCleaningAgent:
                 column_name, question_context, sample_responses, user_examples
             )
             
-            # Analyze responses in batches to avoid token limits
-            batch_size = 50
-            all_results = []
+            # Repeated responses ("test", "n/a", ...) only need to be classified once
+            unique_responses = pd.Series(column_data.unique())
             
-            for i in range(0, len(column_data), batch_size):
-                batch = column_data.iloc[i:i+batch_size]
-                batch_results = self._analyze_response_batch(batch, context_info)
-                all_results.extend(batch_results)
+            # Blank, repeated-character and placeholder responses are flagged without the LLM
+            obvious_mask = unique_responses.astype(str).str.match(_RE_OBVIOUS_JUNK).to_numpy()
+            unique_results = [
+                {"text": str(text), "is_junk": True, "confidence": 100, "reason": "Blank, repeated-character or placeholder response"}
+                for text in unique_responses[obvious_mask]
+            ]
+            unique_responses = unique_responses[~obvious_mask]
+            self.logger.info(f"🔁 {len(unique_results)} obvious junk responses pre-flagged, {len(unique_responses)} distinct responses to classify")
+            
+            # Analyze responses in batches to avoid token limits; the LLM calls are
+            # independent and network-bound, so batches run concurrently
+            batches = [
+                unique_responses.iloc[i:i + JUNK_DETECTION_BATCH_SIZE]
+                for i in range(0, len(unique_responses), JUNK_DETECTION_BATCH_SIZE)
+            ]
+            
+            if batches:
+                with ThreadPoolExecutor(max_workers=min(JUNK_DETECTION_MAX_CONCURRENCY, len(batches))) as executor:
+                    for batch_results in executor.map(lambda batch: self._analyze_response_batch(batch, context_info), batches):
+                        unique_results.extend(batch_results)
+            
+            # Map the judgements back onto every row so counts reflect all responses
+            judgements = {str(result['text']): result for result in unique_results}
+            all_results = []
+            matched_texts = set()
+            for text_value in column_data.astype(str):
+                result = judgements.get(text_value)
+                if result is not None:
+                    all_results.append(result)
+                    matched_texts.add(text_value)
+            # Keep judgements whose text the LLM did not echo back verbatim
+            all_results.extend(result for text, result in judgements.items() if text not in matched_texts)
             
             # Filter results by confidence threshold
             flagged_responses = [
@@ -4403,16 +5313,19 @@ class DataCleaningAgent:
             
             # Parse JSON response with robust markdown cleaning
             try:
-                # First, try to extract JSON from markdown code blocks using regex
-                import re
+                # First, try to extract JSON from the first markdown code block
+                json_content = None
+                fence_start = result_text.find("```")
+                if fence_start != -1:
+                    content_start = fence_start + 3
+                    if result_text[content_start:content_start + 4].lower() == "json":
+                        content_start += 4
+                    fence_end = result_text.find("```", content_start)
+                    if fence_end != -1:
+                        json_content = result_text[content_start:fence_end].strip()
                 
-                # Look for JSON inside markdown code blocks
-                markdown_pattern = r'```(?:json)?\s*\n?(.*?)\n?```'
-                markdown_match = re.search(markdown_pattern, result_text, re.DOTALL | re.IGNORECASE)
-                
-                if markdown_match:
+                if json_content is not None:
                     # Extract JSON from markdown block
-                    json_content = markdown_match.group(1).strip()
                     self.logger.info(f"Extracted JSON from markdown block: {len(json_content)} characters")
                 else:
                     # No markdown blocks found, use original text
@@ -4420,7 +5333,7 @@ class DataCleaningAgent:
                     self.logger.info(f"No markdown blocks found, parsing raw content: {len(json_content)} characters")
                 
                 # Parse the cleaned JSON
-                results = json.loads(json_content)
+                results = _loads_json(json_content)
                 self.logger.info(f"Successfully parsed JSON with {len(results)} items")
                 
                 # Filter only junk responses
@@ -4448,20 +5361,18 @@ class DataCleaningAgent:
             junk_results: results from detect_junk_responses
             
         Returns:
-            DataFrame with new junk flag column added
+            DataFrame with new junk flag column added (uint8, 1 = junk, 0 = not junk)
         """
         try:
             flag_column_name = f"{column_name}_junk_flag"
-            df[flag_column_name] = 0
             
-            # Create a mapping of text to junk status
-            junk_texts = {item['text']: 1 for item in junk_results.get('flagged_responses', [])}
+            # Set of flagged response texts
+            junk_texts = {item['text'] for item in junk_results.get('flagged_responses', [])}
             
-            # Apply flags based on text matching
-            for idx, row in df.iterrows():
-                text_value = str(row[column_name]) if pd.notna(row[column_name]) else ""
-                if text_value in junk_texts:
-                    df.at[idx, flag_column_name] = 1
+            # Apply flags based on text matching, with missing values compared as ""
+            column = df[column_name]
+            text_values = column.astype(str).where(column.notna(), "")
+            df[flag_column_name] = text_values.isin(junk_texts).astype(np.uint8)
             
             self.logger.info(f"✅ Created junk flag column '{flag_column_name}'")
             return df
@@ -4473,11 +5384,91 @@ class DataCleaningAgent:
 class UniversalClarificationSystem:
     """Universal system for handling ambiguous user queries by asking for clarification."""
     
-    def __init__(self, llm):
+    _RAW_OPTION_TEMPLATES = {
+        "JUNK_DETECTION": {
+            "id": "junk_analysis",
+            "title": "🧹 Analyze data quality",
+            "description": "Identify and summarize junk/spam responses with confidence scores",
+            "category": "JUNK_DETECTION"
+        },
+        "SPREADSHEET_COMMAND": {
+            "id": "spreadsheet_action", 
+            "title": "🎨 Format or manipulate spreadsheet",
+            "description": "Apply formatting, highlighting, or other visual changes to cells",
+            "category": "SPREADSHEET_COMMAND"
+        },
+        "SPECIFIC_DATA": {
+            "id": "data_query",
+            "title": "📊 Query and analyze data",
+            "description": "Get specific information, summaries, or insights from your data",
+            "category": "SPECIFIC_DATA"
+        },
+        "VISUALIZATION": {
+            "id": "create_chart",
+            "title": "📈 Create visualization",
+            "description": "Generate charts, graphs, or visual representations of your data",
+            "category": "VISUALIZATION"
+        },
+        "ANALYSIS": {
+            "id": "statistical_analysis",
+            "title": "🔬 Perform statistical analysis",
+            "description": "Run correlations, patterns analysis, or other statistical operations",
+            "category": "ANALYSIS"
+        },
+        "DUPLICATE_CHECK": {
+            "id": "duplicate_handling",
+            "title": "🔍 Handle duplicate data",
+            "description": "Find, analyze, or remove duplicate rows from your dataset",
+            "category": "DUPLICATE_CHECK"
+        },
+        "MISSING_VALUES": {
+            "id": "missing_data",
+            "title": "🔧 Handle missing values",
+            "description": "Identify, analyze, or fix missing/null values in your data",
+            "category": "MISSING_VALUES"
+        },
+        "TRANSLATION": {
+            "id": "translate_content",
+            "title": "🌍 Translate content",
+            "description": "Translate text content in your data to different languages",
+            "category": "TRANSLATION"
+        }
+    }
+    
+    # Map: category -> (plain option, recommended option), built once at class load
+    _OPTION_TEMPLATES = {
+        category: (template, {**template, "title": f"✨ {template['title']} (Recommended)"})
+        for category, template in _RAW_OPTION_TEMPLATES.items()
+    }
+    # Committed choices between re-picks of the most chosen ("hot") category
+    HOT_CATEGORY_REFRESH_INTERVAL = 16
+    
+    def __init__(self, llm, preferences_path=None, preferences_scope="default"):
         self.llm = llm
         self.logger = logging.getLogger(__name__)
-        self.user_preferences = {}  # Store user preference patterns
+        self.user_preferences = {}  # Map: pattern -> Counter of categories chosen for it
+        self._preference_scores = {}  # Map: pattern tuple -> (preferred category, boost); cleared on learning
+        self._category_hits = Counter()  # Map: category -> committed choices
+        self._hot_category = None  # Most chosen category, checked before the template table
+        self._hot_templates = None
         self.confidence_threshold = 75  # Queries below this trigger clarification
+        
+        # Persistent preference store, so learned choices survive restarts; preferences_scope
+        # (e.g. a user or workspace id) keeps one user's choices from steering another's
+        self.preferences_scope = preferences_scope
+        try:
+            self.preference_store = shared_preference_store(preferences_path)
+            for pattern, category, count in self.preference_store.load(preferences_scope):
+                # Share the extractor's interned tag and category objects rather than fresh row strings
+                pattern, category = sys.intern(pattern), sys.intern(category)
+                self.user_preferences.setdefault(pattern, Counter())[category] = count
+                # Persisted counts seed the choice distribution so the hot category survives restarts
+                self._category_hits[category] += count
+        except Exception as e:
+            self.logger.warning("⚠️ Clarification preference store unavailable, preferences will not persist: %s", e)
+            self.preference_store = None
+        if self._category_hits:
+            self._refresh_hot_category()
     
     def analyze_query_confidence(self, question: str, initial_category: str) -> tuple[str, int, list]:
         """
@@ -4490,9 +5481,9 @@ class UniversalClarificationSystem:
         Returns:
             tuple: (category, confidence_score, alternative_categories)
         """
-        self.logger.info(f"🔬 === CLARIFICATION SYSTEM ANALYSIS START ===")
-        self.logger.info(f"📝 Query: '{question}'")
-        self.logger.info(f"🎯 Initial category: {initial_category}")
+        self.logger.info("🔬 === CLARIFICATION SYSTEM ANALYSIS START ===")
+        self.logger.info("📝 Query: '%s'", question)
+        self.logger.info("🎯 Initial category: %s", initial_category)
         
         try:
             analysis_prompt = f"""
@@ -4534,32 +5525,32 @@ class UniversalClarificationSystem:
             }}
             """
             
-            self.logger.info(f"🤖 Sending confidence analysis to LLM...")
-            self.logger.info(f"🤖 Analysis prompt: {analysis_prompt}")
+            self.logger.info("🤖 Sending confidence analysis to LLM...")
+            self.logger.info("🤖 Analysis prompt: %s", analysis_prompt)
             
             response = self.llm.invoke(analysis_prompt)
-            self.logger.info(f"🤖 LLM raw response: '{response.content}'")
+            self.logger.info("🤖 LLM raw response: '%s'", response.content)
             
             raw_content = response.content.strip().replace('```json', '').replace('```', '').strip()
-            self.logger.info(f"🤖 Cleaned response: '{raw_content}'")
+            self.logger.info("🤖 Cleaned response: '%s'", raw_content)
             
             result = json.loads(raw_content)
-            self.logger.info(f"🤖 Parsed JSON result: {result}")
+            self.logger.info("🤖 Parsed JSON result: %s", result)
             
             confidence = result.get('confidence', 50)
             category = result.get('primary_category', initial_category)
             alternatives = result.get('alternatives', [])
             
-            self.logger.info(f"✅ Query confidence analysis complete:")
-            self.logger.info(f"   - Confidence: {confidence}%")
-            self.logger.info(f"   - Category: {category}")
-            self.logger.info(f"   - Alternatives: {alternatives}")
-            self.logger.info(f"   - Threshold check: {confidence}% {'<' if confidence < self.confidence_threshold else '>='} {self.confidence_threshold}%")
+            self.logger.info("✅ Query confidence analysis complete:")
+            self.logger.info("   - Confidence: %s%%", confidence)
+            self.logger.info("   - Category: %s", category)
+            self.logger.info("   - Alternatives: %s", alternatives)
+            self.logger.info("   - Threshold check: %s%% %s %s%%", confidence, '<' if confidence < self.confidence_threshold else '>=', self.confidence_threshold)
             
             return category, confidence, alternatives
             
         except Exception as e:
-            self.logger.error(f"❌ Error in confidence analysis: {str(e)}")
+            self.logger.error("❌ Error in confidence analysis: %s", e)
             # Fallback: assume medium confidence
             return initial_category, 60, []
     
@@ -4607,7 +5598,7 @@ class UniversalClarificationSystem:
             }
             
         except Exception as e:
-            self.logger.error(f"❌ Error generating clarification response: {str(e)}")
+            self.logger.error("❌ Error generating clarification response: %s", e)
             return {
                 "type": "regular",
                 "message": "I'm not sure how to help with that. Could you please rephrase your question or tell me more specifically what you'd like me to do?"
@@ -4632,63 +5623,12 @@ class UniversalClarificationSystem:
     def _create_option_for_category(self, category: str, question: str, is_primary: bool = False) -> dict:
         """Create a user-friendly option for a specific category."""
         
-        option_templates = {
-            "JUNK_DETECTION": {
-                "id": "junk_analysis",
-                "title": "🧹 Analyze data quality",
-                "description": "Identify and summarize junk/spam responses with confidence scores",
-                "category": "JUNK_DETECTION"
-            },
-            "SPREADSHEET_COMMAND": {
-                "id": "spreadsheet_action", 
-                "title": "🎨 Format or manipulate spreadsheet",
-                "description": "Apply formatting, highlighting, or other visual changes to cells",
-                "category": "SPREADSHEET_COMMAND"
-            },
-            "SPECIFIC_DATA": {
-                "id": "data_query",
-                "title": "📊 Query and analyze data",
-                "description": "Get specific information, summaries, or insights from your data",
-                "category": "SPECIFIC_DATA"
-            },
-            "VISUALIZATION": {
-                "id": "create_chart",
-                "title": "📈 Create visualization",
-                "description": "Generate charts, graphs, or visual representations of your data",
-                "category": "VISUALIZATION"
-            },
-            "ANALYSIS": {
-                "id": "statistical_analysis",
-                "title": "🔬 Perform statistical analysis",
-                "description": "Run correlations, patterns analysis, or other statistical operations",
-                "category": "ANALYSIS"
-            },
-            "DUPLICATE_CHECK": {
-                "id": "duplicate_handling",
-                "title": "🔍 Handle duplicate data",
-                "description": "Find, analyze, or remove duplicate rows from your dataset",
-                "category": "DUPLICATE_CHECK"
-            },
-            "MISSING_VALUES": {
-                "id": "missing_data",
-                "title": "🔧 Handle missing values",
-                "description": "Identify, analyze, or fix missing/null values in your data",
-                "category": "MISSING_VALUES"
-            },
-            "TRANSLATION": {
-                "id": "translate_content",
-                "title": "🌍 Translate content",
-                "description": "Translate text content in your data to different languages",
-                "category": "TRANSLATION"
-            }
-        }
-        
-        template = option_templates.get(category)
-        if template:
-            option = template.copy()
-            if is_primary:
-                option["title"] = f"✨ {option['title']} (Recommended)"
-            return option
+        if category == self._hot_category:
+            templates = self._hot_templates
+        else:
+            templates = self._OPTION_TEMPLATES.get(category)
+        if templates:
+            return dict(templates[1 if is_primary else 0])
         
         return None
     
@@ -4704,67 +5644,56 @@ class UniversalClarificationSystem:
         Returns:
             tuple: (processed_query, final_category)
         """
-        try:
-            # Learn user preference
-            self._learn_user_preference(original_query, choice_id, category)
-            
-            # If user chose "other", ask for more details
-            if choice_id == "other":
-                return original_query, "CLARIFY_MORE"
-            
-            # Otherwise, return the query with the selected category
-            self.logger.info(f"✅ User chose {choice_id} for query: '{original_query}'")
-            return original_query, category
-            
-        except Exception as e:
-            self.logger.error(f"❌ Error processing user choice: {str(e)}")
-            return original_query, category
+        # If user chose "other", ask for more details; nothing was committed to learn from
+        if choice_id == "other":
+            return original_query, "CLARIFY_MORE"
+        
+        # Learn user preference
+        self._learn_user_preference(original_query, choice_id, category)
+        
+        # Periodically re-pick the hot category from the choice distribution
+        self._category_hits[category] += 1
+        if self._category_hits.total() % self.HOT_CATEGORY_REFRESH_INTERVAL == 1:
+            self._refresh_hot_category()
+        
+        # Otherwise, return the query with the selected category
+        self.logger.info("✅ User chose %s for query: '%s'", choice_id, original_query)
+        return original_query, category
+    
+    def _refresh_hot_category(self):
+        """Re-pick the most chosen category and its option templates from the choice distribution."""
+        hot_category = self._category_hits.most_common(1)[0][0]
+        self._hot_templates = self._OPTION_TEMPLATES.get(hot_category)
+        self._hot_category = hot_category if self._hot_templates else None
     
     def _learn_user_preference(self, query: str, choice_id: str, category: str):
         """Learn user preferences for similar future queries."""
-        try:
-            # Extract key patterns from the query
-            key_patterns = self._extract_key_patterns(query)
-            
-            # Store preference
-            for pattern in key_patterns:
-                if pattern not in self.user_preferences:
-                    self.user_preferences[pattern] = {}
-                
-                if category not in self.user_preferences[pattern]:
-                    self.user_preferences[pattern][category] = 0
-                
-                self.user_preferences[pattern][category] += 1
-            
-            self.logger.debug(f"📚 Learned preference: {key_patterns} → {category}")
-            
-        except Exception as e:
-            self.logger.error(f"❌ Error learning user preference: {str(e)}")
-    
-    def _extract_key_patterns(self, query: str) -> list:
-        """Extract key patterns from user query for learning."""
-        patterns = []
-        query_lower = query.lower()
+        # Too short to contain any vocabulary word (e.g. "ok", "y")
+        if not query or len(query) < _CLARIFICATION_MIN_WORD_LENGTH:
+            return
         
-        # Action verbs
-        action_verbs = ['find', 'show', 'create', 'make', 'generate', 'analyze', 'identify', 'clean', 'remove', 'fix']
-        for verb in action_verbs:
-            if verb in query_lower:
-                patterns.append(f"action:{verb}")
+        # Extract key patterns from the query; nothing to learn when none match
+        key_patterns = self._extract_key_patterns(query)
+        if not key_patterns:
+            return
         
-        # Subject nouns
-        subjects = ['junk', 'duplicate', 'chart', 'graph', 'data', 'trend', 'pattern', 'missing', 'null']
-        for subject in subjects:
-            if subject in query_lower:
-                patterns.append(f"subject:{subject}")
+        # Store preference
+        for pattern in key_patterns:
+            self.user_preferences.setdefault(pattern, Counter())[category] += 1
+        self._preference_scores.clear()
         
-        # Combined patterns
-        if 'junk' in query_lower and 'find' in query_lower:
-            patterns.append("pattern:find_junk")
-        if 'show' in query_lower and 'trend' in query_lower:
-            patterns.append("pattern:show_trend")
+        # Only the database write can realistically fail; in-memory learning already happened
+        if self.preference_store is not None:
+            try:
+                self.preference_store.increment(self.preferences_scope, ((pattern, category) for pattern in key_patterns))
+            except Exception as e:
+                self.logger.error("❌ Error persisting user preference: %s", e)
         
-        return patterns
+        self.logger.debug("📚 Learned preference: %s → %s", key_patterns, category)
+    
+    def _extract_key_patterns(self, query: str) -> list:
+        """Extract key patterns from user query for learning."""
+        return list(_extract_clarification_patterns(query.lower().strip()))
     
     def check_learned_preferences(self, query: str) -> tuple[str, int]:
         """
@@ -4776,24 +5705,32 @@ class UniversalClarificationSystem:
         Returns:
             tuple: (preferred_category, confidence_boost)
         """
-        try:
-            patterns = self._extract_key_patterns(query)
-            category_scores = {}
-            
-            for pattern in patterns:
-                if pattern in self.user_preferences:
-                    for category, count in self.user_preferences[pattern].items():
-                        category_scores[category] = category_scores.get(category, 0) + count
-            
-            if category_scores:
-                # Get the most preferred category
-                preferred_category = max(category_scores.items(), key=lambda x: x[1])
-                confidence_boost = min(30, preferred_category[1] * 10)  # Max 30 point boost
-                
-                self.logger.debug(f"📈 Learned preference boost: {preferred_category[0]} (+{confidence_boost}%)")
-                return preferred_category[0], confidence_boost
-            
-        except Exception as e:
-            self.logger.error(f"❌ Error checking learned preferences: {str(e)}")
+        if not query:
+            return None, 0
+        
+        patterns = _extract_clarification_patterns(query.lower().strip())
+        
+        # Scores only change when a preference is learned, so reuse them for repeated pattern sets
+        cached = self._preference_scores.get(patterns)
+        if cached is not None:
+            return cached
+        
+        category_scores = Counter()
+        for pattern in patterns:
+            pattern_counter = self.user_preferences.get(pattern)
+            if pattern_counter:
+                category_scores.update(pattern_counter)
+        
+        if category_scores:
+            # Get the most preferred category
+            preferred_category = category_scores.most_common(1)[0]
+            times_chosen = preferred_category[1]
+            confidence_boost = 30 if times_chosen >= 3 else times_chosen * 10  # Max 30 point boost
+            
+            self.logger.debug("📈 Learned preference boost: %s (+%s%%)", preferred_category[0], confidence_boost)
+            result = preferred_category[0], confidence_boost
+        else:
+            result = None, 0
         
-        return None, 0
\ No newline at end of file
+        self._preference_scores[patterns] = result
+        return result
\ No newline at end of file
@@ -232,8 +232,11 @@ class DataHandler:
             print(f"DEBUG: Updated column mapping: {self.column_mapping}")
 
 
-    def get_df(self):
-        return self.df.copy() if self.df is not None else None 
+    def get_df(self, copy=True):
+        # Read-only callers can pass copy=False to skip duplicating the whole frame
+        if self.df is None:
+            return None
+        return self.df.copy() if copy else self.df
     
     def update_df(self, new_df):
         """
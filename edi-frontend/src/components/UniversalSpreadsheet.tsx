@@ -856,8 +856,15 @@ export default function UniversalSpreadsheet({
       }
 
       try {
-        // Convert backend sheet_data (Luckysheet celldata format) to 2D array
-        if (sheetData && sheetData.celldata) {
+        let dataArray: any[][];
+
+        // Compact backend sheet_data already carries the 2D array (header row first)
+        if (sheetData && Array.isArray(sheetData.data)) {
+          dataArray = sheetData.data;
+
+          console.log(`📋 [Univer] Using compact sheet data ${dataArray.length}x${sheetData.column} for sheet: ${sheetName}`);
+        } else if (sheetData && sheetData.celldata) {
+          // Convert backend sheet_data (Luckysheet celldata format) to 2D array
           const celldata = sheetData.celldata;
 
           // Get dimensions
@@ -865,7 +872,7 @@ export default function UniversalSpreadsheet({
           const maxCol = Math.max(...celldata.map((cell: any) => cell.c)) + 1;
 
           // Initialize 2D array
-          const dataArray: any[][] = [];
+          dataArray = [];
           for (let r = 0; r < maxRow; r++) {
             dataArray[r] = new Array(maxCol).fill('');
           }
@@ -878,18 +885,19 @@ export default function UniversalSpreadsheet({
           });
 
           console.log(`📋 [Univer] Converting celldata to ${dataArray.length}x${maxCol} array for sheet: ${sheetName}`);
+        } else {
+          console.error('[Univer] Invalid sheet data received');
+          return;
+        }
 
-          // Add the sheet using UniverAdapter
-          const success = univerAdapterRef.current.addSheet(sheetName, dataArray);
+        // Add the sheet using UniverAdapter
+        const success = univerAdapterRef.current.addSheet(sheetName, dataArray);
 
-          if (success) {
-            console.log(`✅ [Univer] Successfully added sheet: ${sheetName}`);
-          } else {
-            console.error(`❌ [Univer] Failed to add sheet: ${sheetName}`);
-            alert('Failed to create new sheet. Please try again.');
-          }
+        if (success) {
+          console.log(`✅ [Univer] Successfully added sheet: ${sheetName}`);
         } else {
-          console.error('[Univer] Invalid sheet data received');
+          console.error(`❌ [Univer] Failed to add sheet: ${sheetName}`);
+          alert('Failed to create new sheet. Please try again.');
         }
       } catch (error) {
         console.error('[Univer] Error adding new sheet:', error);
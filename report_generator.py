@@ -8,7 +8,10 @@ import numpy as np
 from io import BytesIO
 import uuid
 import os
+import hashlib
 import time # For potential retries
+import shutil
+from pathlib import Path
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle, KeepInFrame
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -20,6 +23,39 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY, TA_RIGHT
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
 
+import settings
+
+# LLM section texts are cached on disk per dataset fingerprint, so regenerating a report
+# for unchanged data reuses them instead of repeating every Kimi call
+REPORT_LLM_CACHE_DIR = Path(settings.CACHE_DIR) / "report_summaries"
+REPORT_LLM_CACHE_MAX_DATASETS = 20  # Least recently reported fingerprints beyond this are pruned
+
+
+def _dataset_fingerprint(df):
+    """Digest of a DataFrame's columns, dtypes, shape and row contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), df.shape)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _prune_report_cache(current_fingerprint, keep=REPORT_LLM_CACHE_MAX_DATASETS):
+    """
+    Mark current_fingerprint as just used and delete the least recently used fingerprint
+    directories beyond `keep`, so the cache does not grow with every dataset reported on.
+    """
+    current_dir = REPORT_LLM_CACHE_DIR / current_fingerprint
+    current_dir.mkdir(parents=True, exist_ok=True)
+    os.utime(current_dir)
+    fingerprint_dirs = sorted(
+        (entry for entry in REPORT_LLM_CACHE_DIR.iterdir() if entry.is_dir()),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for stale_dir in fingerprint_dirs[keep:]:
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+
 # --- ReportGenerator Class ---
 class ReportGenerator:
     def __init__(self, data_handler, agent_services_instance, groq_api_key=None):
@@ -35,6 +71,7 @@ class ReportGenerator:
         self.table_count = 0
         self.max_plots_per_section = 3
         self.max_cat_for_bivariate = 10
+        self._dataset_fingerprint = None  # Set per report; keys the on-disk LLM text cache
 
         # --- Instantiate Kimi LLM via Groq ---
         api_key = groq_api_key or os.getenv("NEXT_PUBLIC_GROQ_API_KEY")
@@ -50,9 +87,30 @@ class ReportGenerator:
         print("ReportGenerator initialized with Kimi model via Groq (moonshotai/kimi-k2-instruct-0905).")
 
 
+    def _llm_cache_path(self, prompt_text):
+        if self._dataset_fingerprint is None:
+            return None
+        prompt_digest = hashlib.blake2b(prompt_text.encode("utf-8"), digest_size=16).hexdigest()
+        return REPORT_LLM_CACHE_DIR / self._dataset_fingerprint / f"{prompt_digest}.txt"
+
     def _invoke_llm(self, prompt_text, max_retries=3, delay=5):
-        """Helper function to call Kimi LLM via Groq with retries and error handling."""
+        """Helper function to call Kimi LLM via Groq with retries, error handling and a per-dataset cache."""
         self._check_cancellation() # Check before making an API call
+        cache_path = self._llm_cache_path(prompt_text)
+        if cache_path is not None and cache_path.is_file():
+            return cache_path.read_text(encoding="utf-8")
+
+        response_text = self._invoke_llm_uncached(prompt_text, max_retries, delay)
+        # Only successful replies are cached; error fallbacks should be retried next time
+        if cache_path is not None and not response_text.startswith("Error:"):
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(response_text, encoding="utf-8")
+            except OSError as e:
+                print(f"Warning: Could not cache report text: {e}")
+        return response_text
+
+    def _invoke_llm_uncached(self, prompt_text, max_retries, delay):
         for attempt in range(max_retries):
             try:
                 # Use LangChain invoke method
@@ -619,6 +677,16 @@ class ReportGenerator:
         df = self.data_handler.get_df()
         if df is None or df.empty:
             return None, "No data loaded or data is empty, cannot generate report."
+        try:
+            self._dataset_fingerprint = _dataset_fingerprint(df)
+        except TypeError:
+            # Unhashable cell values (lists, dicts); generate without the cache
+            self._dataset_fingerprint = None
+        if self._dataset_fingerprint is not None:
+            try:
+                _prune_report_cache(self._dataset_fingerprint)
+            except OSError as e:
+                print(f"Warning: Could not prune report text cache: {e}")
 
         self.story = [] 
         self.figure_count = 0
@@ -10,6 +10,13 @@ GROQ_API_KEY = os.getenv("NEXT_PUBLIC_GROQ_API_KEY")
 AZURE_SPEECH_KEY = os.getenv("AZURE_API_KEY")
 AZURE_SERVICE_REGION = os.getenv("AZURE_REGION")
 
+# Token budget for agent conversation memory; older turns are summarized beyond it
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "512"))
+
+# On-disk caches (translations, clarification preferences, report texts) live here, anchored
+# to the app directory rather than whatever the working directory happens to be
+CACHE_DIR = os.path.abspath(os.getenv("EDI_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
 # Initialize Kimi LLM via Groq
 LLM = None
 if GROQ_API_KEY:
@@ -0,0 +1,29 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+agent_services = pytest.importorskip("agent_services")
+
+
+def test_only_text_dtypes_are_selected_for_translation():
+    df = pd.DataFrame({
+        "name": ["Alice", "Bob", "Carla"],
+        "city": pd.Categorical(["Paris", "Rome", "Paris"]),
+        "order_id": ["1001", "1002", "1003"],
+        "amount": [1.5, 2.0, 3.25],
+        "active": [True, False, True],
+        "created": pd.to_datetime(["2024-01-01 10:00:00", "2024-01-02 11:30:00", "2024-01-03 09:15:00"]),
+        "duration": pd.to_timedelta(["1 days 02:00:00", "0 days 00:30:00", "3 days 00:00:00"]),
+        "empty": pd.Series([None, None, None], dtype=object),
+    })
+
+    selected = agent_services._select_text_columns(df, list(df.columns))
+
+    assert selected == ["name", "city"]
+
+
+def test_datetime_column_is_never_sent_for_translation():
+    df = pd.DataFrame({
+        "created": pd.to_datetime(["2024-01-01 10:00:00", "2024-06-30 23:59:59"]),
+    })
+
+    assert agent_services._select_text_columns(df, ["created"]) == []